@@ -0,0 +1,208 @@
+"""
+assets.py - Image processing for the Weather Forecast build script.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import hashlib, json, multiprocessing, os, shutil, subprocess, sys, time
+
+def find_symbols(directory):
+
+    """Returns a list of the symbol images in the directory, sorted by name.
+    Each is given as a tuple containing the symbol as it appears in forecast
+    documents, such as "1d" for the image 01d.png, the name of its resource
+    and the path to the image."""
+
+    symbols = []
+
+    for name in sorted(os.listdir(directory)):
+
+        base, suffix = os.path.splitext(name)
+        if suffix != ".png":
+            continue
+
+        symbol = base.lstrip("0")
+        symbols.append((symbol, "s" + base, os.path.join(directory, name)))
+
+    return symbols
+
+
+def image_hash(path, command):
+
+    h = hashlib.sha1(" ".join(command).encode("utf8"))
+    f = open(path, "rb")
+    h.update(f.read())
+    f.close()
+    return h.hexdigest()
+
+
+def run_commands(jobs, command):
+
+    # Run the command on each of the images in the list of (name, source,
+    # output) tuples, running one process per core at a time, and return a
+    # dictionary containing the time taken to process each image. The
+    # processes are started and polled from this thread so that the images
+    # can be processed while the build script is being imported. If the
+    # command is not available, or fails, the image is copied instead.
+    jobs = jobs[:]
+    running = {}
+    times = {}
+
+    while jobs or running:
+
+        while jobs and len(running) < multiprocessing.cpu_count():
+
+            name, source, output = jobs.pop(0)
+            try:
+                process = subprocess.Popen(command + ["--output", output,
+                                                      "--", source])
+            except OSError:
+                process = None
+
+            running[name] = (process, source, output, time.time())
+
+        for name, (process, source, output, started) in running.items():
+
+            if process != None and process.poll() == None:
+                continue
+
+            if process == None or process.returncode != 0 or \
+               not os.path.exists(output):
+                shutil.copyfile(source, output)
+
+            times[name] = time.time() - started
+            del running[name]
+
+        if running:
+            time.sleep(0.01)
+
+    return times
+
+
+def process_images(images, output_dir, command):
+
+    """Processes the images, given as a list of (name, path) tuples, with the
+    command, writing the results to files in the output directory and
+    returning a dictionary mapping each name to the path of its output.
+
+    A manifest in the output directory records the hash of each image and
+    the command used to process it, so only images that have changed since
+    the last build are processed again. These are processed in parallel."""
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    try:
+        manifest = json.load(open(manifest_path))
+    except (IOError, ValueError):
+        manifest = {}
+
+    outputs = {}
+    jobs = []
+    hashes = {}
+    saved = 0.0
+
+    for name, path in images:
+
+        output = os.path.join(output_dir, name + ".png")
+        outputs[name] = output
+        hashes[name] = image_hash(path, command)
+
+        entry = manifest.get(name)
+        if entry and entry["hash"] == hashes[name] and os.path.exists(output):
+            saved += entry["time"]
+        else:
+            jobs.append((name, path, output))
+
+    started = time.time()
+
+    times = run_commands(jobs, command)
+
+    for name, taken in times.items():
+        manifest[name] = {"hash": hashes[name], "time": taken}
+
+    # Forget any images that have been removed.
+    for name in list(manifest.keys()):
+        if name not in outputs:
+            del manifest[name]
+
+    f = open(manifest_path, "w")
+    json.dump(manifest, f, sort_keys = True, indent = 1)
+    f.close()
+
+    sys.stdout.write("Processed %i of %i images in %.2f s, saving %.2f s by "
+                     "reusing the others.\n" % (len(jobs), len(images),
+                     time.time() - started, saved))
+
+    return outputs
+
+
+# The columns of the symbol table for the day, night and polar versions of
+# each symbol, identified by the suffixes of their names.
+VARIANTS = ["d", "n", "m"]
+
+# The symbol numbers used in forecast documents, each with the versions that
+# have their own images. Symbols that look the same at all times have a
+# single image without a suffix.
+SYMBOLS = dict(
+    [(number, VARIANTS) for number in [1, 2, 3, 5, 6, 7, 8, 20, 21, 24, 25,
+                                       26, 27, 28, 29, 40, 41, 42, 43, 44,
+                                       45]] +
+    [(number, []) for number in [4, 9, 10, 11, 12, 13, 14, 15, 22, 23, 30,
+                                 31, 32, 33, 34, 46, 47, 48, 49, 50]])
+
+def make_symbol_table(symbols):
+
+    """Returns a list containing a table of resource names for the symbols,
+    given as a list of tuples like those returned by find_symbols. The table
+    has a row for each symbol number up to the highest one, containing the
+    names of the images for the day, night and polar versions of the symbol.
+    Symbols with the same image at all times have its name in each column,
+    and unused rows contain empty strings. The application looks up the IDs
+    of the resources with these names when it starts.
+
+    The build is stopped unless there is exactly one image for each of the
+    symbols and versions listed in SYMBOLS."""
+
+    images = {}
+    for symbol, name, path in symbols:
+        images[symbol] = name
+
+    table = [""] * (3 * (max(SYMBOLS.keys()) + 1))
+    expected = set()
+
+    for number, variants in SYMBOLS.items():
+
+        if variants:
+            names = [str(number) + suffix for suffix in variants]
+        else:
+            names = [str(number)] * 3
+
+        expected.update(names)
+
+        for i, symbol in enumerate(names):
+            try:
+                table[number * 3 + i] = images[symbol]
+            except KeyError:
+                sys.exit("Symbol %s has no image." % symbol)
+
+    unexpected = set(images.keys()) - expected
+    if unexpected:
+        sys.exit("Unknown symbol images found: %s" % ", ".join(
+            sorted(unexpected)))
+
+    return table
@@ -0,0 +1,254 @@
+"""
+benchmark.py - Benchmarks for the Weather Forecast application.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from java.io import ByteArrayInputStream, ByteArrayOutputStream, IOException
+from java.lang import Math, Runnable, String, System, Thread
+from android.app import ActivityManager
+from android.content import Context
+from android.os import Debug, Looper
+from android.util import Log
+from android.view import View
+from android.widget import TextView
+from org.xmlpull.v1 import XmlPullParser, XmlPullParserFactory
+from serpentine.activities import Activity
+
+from app_resources import R
+
+from forecastparser import ForecastDocument, ForecastParser, SymbolTable
+from symbolcache import SymbolCache
+from widgets import ForecastWidget
+
+class BenchmarkActivity(Activity):
+
+    # Runs the benchmarks in a background thread when started, writing the
+    # results to the log for the run.py script to collect, then finishes.
+    # Each result is written as a tab-separated line starting with "result",
+    # followed by the benchmark, the document, the time taken in
+    # nanoseconds, the number and total size of the objects allocated, and
+    # the number of forecasts read from the document.
+    #
+    # The parser benchmark measures the parser with the test documents. The
+    # scaling benchmark measures each stage of showing generated documents
+    # of increasing sizes: reading the XML without creating any forecasts
+    # (scan), parsing the forecasts (parse) and binding them to the forecast
+    # widget (bind). The widget is not shown, so binding is measured by
+    # creating and measuring the view for each row of the list in turn,
+    # reusing one view of each type as the list view does when scrolling.
+    
+    __interfaces__ = [Runnable]
+    
+    __fields__ = {"iterations": int, "warmup": int, "benchmarks": String}
+    
+    def __init__(self):
+    
+        Activity.__init__(self)
+    
+    def onCreate(self, bundle):
+    
+        Activity.onCreate(self, bundle)
+        
+        intent = self.getIntent()
+        self.iterations = intent.getIntExtra("iterations", 50)
+        self.warmup = intent.getIntExtra("warmup", 5)
+        self.benchmarks = intent.getStringExtra("benchmarks")
+        if self.benchmarks == None:
+            self.benchmarks = "parser,scaling"
+        
+        view = TextView(self)
+        view.setText("Running benchmarks")
+        self.setContentView(view)
+        
+        Thread(self).start()
+    
+    def run(self):
+    
+        # Let the widgets created by the scaling benchmark use this thread.
+        Looper.prepare()
+        
+        Log.i("Benchmark", "start\t" + str(self.iterations))
+        
+        if self.benchmarks.contains("parser"):
+            self.benchmarkParser("oslo", R.raw.oslo)
+            self.benchmarkParser("locationforecast", R.raw.locationforecast)
+            self.benchmarkParser("locationforecastlts", R.raw.locationforecastlts)
+        
+        if self.benchmarks.contains("scaling"):
+            self.benchmarkStages("periods10", R.raw.periods10, 10)
+            self.benchmarkStages("periods100", R.raw.periods100, 100)
+            self.benchmarkStages("periods1000", R.raw.periods1000, 1000)
+            self.benchmarkStages("periods10000", R.raw.periods10000, 10000)
+        
+        Log.i("Benchmark", "finished")
+        self.finish()
+    
+    @args(void, [String, int])
+    def benchmarkParser(self, name, id):
+    
+        # Read the document into memory so that only the time taken to parse
+        # it is measured. The same parser is used for every iteration, as in
+        # the application, and the first few iterations are not recorded so
+        # that the code has been compiled before it is measured.
+        data = self.readResource(id)
+        if data == None:
+            Log.i("Benchmark", "error\tparser\t" + name)
+            return
+        
+        parser = ForecastParser(SymbolTable(self.getResources()))
+        i = 0
+        
+        Debug.startAllocCounting()
+        
+        while i < self.warmup + self.iterations:
+        
+            stream = ByteArrayInputStream(data)
+            Debug.resetThreadAllocCount()
+            
+            started = System.nanoTime()
+            document = parser.parse(stream, None)
+            elapsed = System.nanoTime() - started
+            
+            count = Debug.getThreadAllocCount()
+            size = Debug.getThreadAllocSize()
+            
+            if i >= self.warmup:
+                Log.i("Benchmark", "result\tparser\t" + name + "\t" + \
+                      str(elapsed) + "\t" + str(count) + "\t" + str(size) + \
+                      "\t" + str(len(document.forecasts)))
+            i += 1
+        
+        Debug.stopAllocCounting()
+    
+    @args(void, [String, int, int])
+    def benchmarkStages(self, name, id, periods):
+    
+        data = self.readResource(id)
+        if data == None:
+            Log.i("Benchmark", "error\tscaling\t" + name)
+            return
+        
+        parser = ForecastParser(SymbolTable(self.getResources()))
+        
+        # Create the symbol cache in the same way as the application, but
+        # for each document so that each one starts with an empty cache.
+        manager = CAST(self.getSystemService(Context.ACTIVITY_SERVICE),
+                       ActivityManager)
+        symbols = SymbolCache(self.getResources(),
+                              manager.getMemoryClass() * 32768)
+        widget = ForecastWidget(self, symbols)
+        
+        # Measure the large documents fewer times to keep the run short.
+        iterations = Math.max(3, Math.min(self.iterations, 10000 / periods))
+        i = 0
+        
+        Debug.startAllocCounting()
+        
+        while i < self.warmup + iterations:
+        
+            record = i >= self.warmup
+            
+            Debug.resetThreadAllocCount()
+            started = System.nanoTime()
+            self.scan(ByteArrayInputStream(data))
+            self.report("scan", name, started, periods, record)
+            
+            Debug.resetThreadAllocCount()
+            started = System.nanoTime()
+            document = parser.parse(ByteArrayInputStream(data), None)
+            self.report("parse", name, started, len(document.forecasts), record)
+            
+            Debug.resetThreadAllocCount()
+            started = System.nanoTime()
+            self.bind(widget, document)
+            self.report("bind", name, started, len(document.forecasts), record)
+            
+            i += 1
+        
+        Debug.stopAllocCounting()
+    
+    @args(void, [String, String, long, int, bool])
+    def report(self, benchmark, name, started, forecasts, record):
+    
+        elapsed = System.nanoTime() - started
+        count = Debug.getThreadAllocCount()
+        size = Debug.getThreadAllocSize()
+        
+        if record:
+            Log.i("Benchmark", "result\t" + benchmark + "\t" + name + "\t" + \
+                  str(elapsed) + "\t" + str(count) + "\t" + str(size) + \
+                  "\t" + str(forecasts))
+    
+    @args(void, [ByteArrayInputStream])
+    def scan(self, stream):
+    
+        # Read every element and attribute without creating any forecasts to
+        # find the cost of reading the XML itself.
+        factory = XmlPullParserFactory.newInstance()
+        parser = factory.newPullParser()
+        parser.setInput(stream, None)
+        
+        eventType = parser.getEventType()
+        while eventType != XmlPullParser.END_DOCUMENT:
+        
+            if eventType == XmlPullParser.START_TAG:
+                i = 0
+                while i < parser.getAttributeCount():
+                    parser.getAttributeValue(i)
+                    i += 1
+            
+            eventType = parser.next()
+    
+    @args(void, [ForecastWidget, ForecastDocument])
+    def bind(self, widget, document):
+    
+        widget.addForecasts(document)
+        
+        adapter = widget.adapter
+        views = array(View, 3)
+        spec = View.MeasureSpec.makeMeasureSpec(0, View.MeasureSpec.UNSPECIFIED)
+        
+        i = 0
+        while i < adapter.getCount():
+        
+            rowType = adapter.getItemViewType(i)
+            view = adapter.getView(i, views[rowType], widget.listView)
+            view.measure(spec, spec)
+            views[rowType] = view
+            i += 1
+    
+    @args([byte], [int])
+    def readResource(self, id):
+    
+        output = ByteArrayOutputStream()
+        
+        try:
+            input = self.getResources().openRawResource(id)
+            buf = array(byte, 4096)
+            
+            while True:
+                length = input.read(buf)
+                if length == -1:
+                    break
+                output.write(buf, 0, length)
+            
+            input.close()
+        
+        except IOException:
+            return None
+        
+        return output.toByteArray()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os, sys
+
+import DUCK
+from DUCK.Tools import buildhelper
+
+# Use the same resources as the application so that the code being measured
+# behaves in the same way. The paths in the application's build script are
+# relative to the directory containing it.
+script = os.path.abspath(__file__)
+root_dir = os.path.split(os.path.split(script)[0])[0]
+os.chdir(root_dir)
+sys.path.insert(0, root_dir)
+
+import build as application
+import feeds
+
+app_name = "Weather Forecast Benchmarks"
+package_name = "uk.org.boddie.android.weatherforecast.benchmarks"
+version = application.version
+
+res_files = dict(application.res_files)
+res_files["raw"] = dict(application.res_files["raw"])
+res_files["raw"].update({
+    "oslo": "tests/oslo.xml",
+    "locationforecast": "tests/api.met.no-weatherapi-locationforecast.xml",
+    "locationforecastlts": "tests/api.met.no-weatherapi-locationforecastlts.xml"
+    })
+
+# Generate documents of increasing sizes for the scaling benchmark.
+res_files["raw"].update(feeds.write_feeds("data/generated/benchmarks"))
+
+code_file = "benchmarks/benchmark.py"
+include_paths = ["src"]
+layout = None
+features = []
+permissions = []
+
+if __name__ == "__main__":
+
+    args = sys.argv[:]
+    
+    result = buildhelper.main(script, app_name, package_name, res_files,
+        layout, code_file, include_paths, features, permissions, args,
+        include_sources = False, options = application.options,
+        version = version)
+
+    sys.exit(result)
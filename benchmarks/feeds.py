@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+"""
+feeds.py - Generates forecast documents for the Weather Forecast benchmarks.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import datetime, os, random, sys
+
+# The sizes of the documents used by the scaling benchmark.
+sizes = [10, 100, 1000, 10000]
+
+# The symbol numbers used in yr.no documents, with their names.
+symbols = [
+    (1, "Clear sky"), (2, "Fair"), (3, "Partly cloudy"), (4, "Cloudy"),
+    (5, "Rain showers"), (6, "Rain showers and thunder"),
+    (7, "Sleet showers"), (8, "Snow showers"), (9, "Rain"),
+    (10, "Heavy rain"), (11, "Heavy rain and thunder"), (12, "Sleet"),
+    (13, "Snow"), (14, "Snow and thunder"), (15, "Fog"),
+    (40, "Light rain showers"), (41, "Heavy rain showers"),
+    (46, "Light rain"), (47, "Light sleet"), (49, "Light snow")
+    ]
+
+winds = [
+    (0.2, "Calm"), (1.5, "Light air"), (3.3, "Light breeze"),
+    (5.4, "Gentle breeze"), (7.9, "Moderate breeze"), (10.7, "Fresh breeze"),
+    (13.8, "Strong breeze"), (17.1, "Near gale"), (20.7, "Gale")
+    ]
+
+directions = [
+    (0.0, "N", "North"), (45.0, "NE", "Northeast"), (90.0, "E", "East"),
+    (135.0, "SE", "Southeast"), (180.0, "S", "South"),
+    (225.0, "SW", "Southwest"), (270.0, "W", "West"),
+    (315.0, "NW", "Northwest")
+    ]
+
+header = u"""<?xml version="1.0" encoding="utf-8"?>
+<weatherdata>
+  <location>
+    <name>Benchmark</name>
+    <type>Populated place</type>
+    <country>Norway</country>
+    <timezone id="Europe/Oslo" utcoffsetMinutes="60" />
+    <location altitude="10" latitude="59.9127" longitude="10.7461" geobase="ssr" geobaseid="72837" />
+  </location>
+  <credit>
+    <link text="Weather forecast from Yr, delivered by the Norwegian Meteorological Institute and the NRK" url="http://www.yr.no/" />
+  </credit>
+  <meta>
+    <lastupdate>%(lastupdate)s</lastupdate>
+    <nextupdate>%(nextupdate)s</nextupdate>
+  </meta>
+  <sun rise="%(rise)s" set="%(set)s" />
+  <forecast>
+    <tabular>
+"""
+
+period_template = u"""      <time from="%(from)s" to="%(to)s" period="%(period)i">
+        <symbol number="%(number)i" numberEx="%(number)i" name="%(name)s" var="%(var)s" />
+        <precipitation value="%(precipitation).1f" />
+        <windDirection deg="%(deg).1f" code="%(code)s" name="%(direction)s" />
+        <windSpeed mps="%(mps).1f" name="%(wind)s" />
+        <temperature unit="celsius" value="%(temperature)i" />
+        <pressure unit="hPa" value="%(pressure).1f" />
+      </time>
+"""
+
+footer = u"""    </tabular>
+  </forecast>
+</weatherdata>
+"""
+
+def time_text(t):
+
+    return t.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def generate_feed(periods, hours = 1, seed = None):
+
+    """Returns the text of a yr.no forecast.xml document containing the given
+    number of forecasts, each covering the given number of hours. The values
+    in the forecasts are random but are the same for each seed, which is the
+    number of periods if no seed is given."""
+
+    if seed is None:
+        seed = periods
+
+    r = random.Random(seed)
+    start = datetime.datetime(2017, 7, 4)
+    step = datetime.timedelta(hours = hours)
+
+    text = [header % {"lastupdate": time_text(start - step),
+                      "nextupdate": time_text(start + step),
+                      "rise": time_text(start.replace(hour = 4, minute = 3)),
+                      "set": time_text(start.replace(hour = 22, minute = 38))}]
+
+    temperature = 15
+    pressure = 1010.0
+
+    for i in range(periods):
+
+        t = start + (step * i)
+        number, name = r.choice(symbols)
+        mps, wind = r.choice(winds)
+        deg, code, direction = r.choice(directions)
+
+        # Let the temperature and pressure wander instead of jumping around.
+        temperature = max(-30, min(35, temperature + r.randint(-2, 2)))
+        pressure = max(960.0, min(1050.0, pressure + r.uniform(-2.0, 2.0)))
+
+        text.append(period_template % {
+            "from": time_text(t), "to": time_text(t + step),
+            "period": t.hour // 6, "number": number, "name": name,
+            "var": "%02i" % number,
+            "precipitation": r.choice([0.0, 0.0, 0.0, r.uniform(0.1, 5.0)]),
+            "deg": deg, "code": code, "direction": direction,
+            "mps": mps, "wind": wind,
+            "temperature": temperature, "pressure": pressure})
+
+    text.append(footer)
+    return u"".join(text)
+
+
+def write_feeds(directory, hours = 1):
+
+    """Writes a document for each of the sizes used by the scaling benchmark
+    to the directory, returning a dictionary mapping the names used for the
+    documents to the paths of the files written."""
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    paths = {}
+
+    for periods in sizes:
+
+        name = "periods%i" % periods
+        path = os.path.join(directory, name + ".xml")
+
+        f = open(path, "wb")
+        f.write(generate_feed(periods, hours).encode("utf8"))
+        f.close()
+
+        paths[name] = path
+
+    return paths
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 3:
+        sys.stderr.write("Usage: %s <number of periods> <output file> "
+                         "[hours per period]\n" % sys.argv[0])
+        sys.exit(1)
+
+    periods = int(sys.argv[1])
+    hours = 1
+    if len(sys.argv) > 3:
+        hours = int(sys.argv[3])
+
+    f = open(sys.argv[2], "wb")
+    f.write(generate_feed(periods, hours).encode("utf8"))
+    f.close()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+"""
+run.py - Runs the Weather Forecast benchmarks on a connected device.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import argparse, json, math, os, subprocess, sys
+
+package_name = "uk.org.boddie.android.weatherforecast.benchmarks"
+baselines_path = os.path.join(os.path.split(os.path.abspath(__file__))[0],
+                              "baselines.json")
+
+def adb(*args):
+
+    return subprocess.check_output(("adb",) + args).decode("utf8")
+
+
+def device_name():
+
+    # Baselines are only comparable on the same device and system version.
+    model = adb("shell", "getprop", "ro.product.model").strip()
+    release = adb("shell", "getprop", "ro.build.version.release").strip()
+    return "%s (Android %s)" % (model, release)
+
+
+def run_benchmarks(iterations, warmup, extras = ()):
+
+    """Starts the benchmark application on the device and returns a list of
+    the results it writes to the log, each as a tuple containing the names
+    of the benchmark and document, the time taken in nanoseconds, the number
+    and size of the objects allocated and the number of forecasts read."""
+
+    component = adb("shell", "cmd", "package", "resolve-activity", "--brief",
+                    "-c", "android.intent.category.LAUNCHER",
+                    package_name).strip().split()[-1]
+
+    adb("logcat", "-c")
+    adb("shell", "am", "start", "-S", "-n", component,
+        "--ei", "iterations", str(iterations), "--ei", "warmup", str(warmup),
+        *extras)
+
+    log = subprocess.Popen(["adb", "logcat", "-v", "raw", "-s", "Benchmark:I"],
+                           stdout = subprocess.PIPE)
+    results = []
+
+    while True:
+
+        line = log.stdout.readline().decode("utf8")
+        if not line:
+            break
+
+        pieces = line.strip().split("\t")
+
+        if pieces[0] == "result":
+            results.append((pieces[1], pieces[2]) + \
+                           tuple(map(int, pieces[3:])))
+        elif pieces[0] == "error":
+            sys.stderr.write("Failed to run %s benchmark for %s.\n" % \
+                             (pieces[1], pieces[2]))
+        elif pieces[0] == "finished":
+            break
+
+    log.terminate()
+    return results
+
+
+def percentile(values, p):
+
+    # Use the nearest rank method on the sorted values.
+    rank = int(math.ceil(p * len(values) / 100.0))
+    return values[max(rank - 1, 0)]
+
+
+def summarise(results):
+
+    """Returns a dictionary mapping the name of each benchmark and document
+    to the mean, median and 99th percentile of the times taken, given in
+    microseconds, and the mean numbers of objects and bytes allocated and
+    forecasts read."""
+
+    groups = {}
+    for result in results:
+        groups.setdefault(result[0] + "/" + result[1], []).append(result[2:])
+
+    summary = {}
+
+    for name, rows in groups.items():
+
+        times = sorted(map(lambda row: row[0] / 1000.0, rows))
+        n = float(len(rows))
+
+        summary[name] = {
+            "samples": len(rows),
+            "mean": sum(times) / n,
+            "p50": percentile(times, 50),
+            "p99": percentile(times, 99),
+            "allocations": sum(map(lambda row: row[1], rows)) / n,
+            "bytes": sum(map(lambda row: row[2], rows)) / n,
+            "forecasts": sum(map(lambda row: row[3], rows)) / n
+            }
+
+    return summary
+
+
+columns = ["mean", "p50", "p99", "allocations", "bytes", "forecasts"]
+
+def report(summary, baseline, threshold):
+
+    """Prints the summary, comparing each value with the baseline, if one is
+    given, and returns the names of the benchmarks whose median times or
+    allocations have increased by more than the threshold percentage."""
+
+    regressions = []
+
+    sys.stdout.write("%-32s" % "benchmark" + "".join(map(lambda column:
+        "%18s" % column, columns)) + "\n")
+
+    for name in sorted(summary.keys()):
+
+        values = summary[name]
+        old = baseline.get(name, {})
+        line = "%-32s" % name
+
+        for column in columns:
+
+            text = "%.1f" % values[column]
+            if column in old and old[column] != 0:
+                change = 100.0 * (values[column] - old[column]) / old[column]
+                text += " (%+.0f%%)" % change
+
+                if column in ("p50", "allocations") and change > threshold:
+                    regressions.append(name)
+
+            line += "%18s" % text
+
+        sys.stdout.write(line + "\n")
+
+    return regressions
+
+
+def report_scaling(summary):
+
+    """Prints the median time taken by each stage of the scaling benchmark
+    for each document size, together with the time and bytes allocated per
+    forecast, so that stages that do not scale linearly can be found. The
+    time taken to build the forecasts is found by subtracting the time taken
+    to scan the document from the time taken to parse it."""
+
+    sizes = []
+    for name in summary.keys():
+        benchmark, document = name.split("/")
+        if benchmark == "parse" and document.startswith("periods"):
+            sizes.append(int(document[len("periods"):]))
+
+    if not sizes:
+        return
+
+    sys.stdout.write("\n%10s" % "periods" + "".join(map(lambda column:
+        "%14s" % column, ["scan", "model", "bind", "total", "us/period",
+                          "bytes/period"])) + "\n")
+
+    for size in sorted(sizes):
+
+        document = "periods%i" % size
+        scan = summary["scan/" + document]
+        parse = summary["parse/" + document]
+        bind = summary["bind/" + document]
+
+        total = parse["p50"] + bind["p50"]
+        allocated = parse["bytes"] + bind["bytes"]
+
+        sys.stdout.write("%10i" % size + "".join(map(lambda value:
+            "%14.1f" % value, [scan["p50"], parse["p50"] - scan["p50"],
+                               bind["p50"], total, total / size,
+                               allocated / size])) + "\n")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = "Runs the benchmarks on "
+        "the device connected with adb and compares the results with the "
+        "baselines recorded for that device. The benchmark package must be "
+        "built with benchmarks/build.py and installed first.")
+    parser.add_argument("-n", "--iterations", type = int, default = 50,
+        help = "the number of times to measure each benchmark")
+    parser.add_argument("-w", "--warmup", type = int, default = 5,
+        help = "the number of unmeasured runs before each benchmark")
+    parser.add_argument("-t", "--threshold", type = float, default = 10.0,
+        help = "the percentage increase treated as a regression")
+    parser.add_argument("-b", "--benchmarks", default = "parser,scaling",
+        help = "a comma-separated list of the benchmarks to run")
+    parser.add_argument("--save", action = "store_true",
+        help = "record the results as the baselines for the device")
+    args = parser.parse_args()
+
+    try:
+        baselines = json.load(open(baselines_path))
+    except IOError:
+        baselines = {}
+
+    device = device_name()
+    summary = summarise(run_benchmarks(args.iterations, args.warmup,
+                                       ("--es", "benchmarks", args.benchmarks)))
+
+    sys.stdout.write(device + "\n\n")
+    regressions = report(summary, baselines.get(device, {}), args.threshold)
+    report_scaling(summary)
+
+    if args.save:
+        baselines.setdefault(device, {}).update(summary)
+        f = open(baselines_path, "w")
+        json.dump(baselines, f, sort_keys = True, indent = 2)
+        f.close()
+        sys.stdout.write("\nBaselines saved to %s\n" % baselines_path)
+
+    elif regressions:
+        sys.stdout.write("\nRegressions: %s\n" % ", ".join(sorted(set(regressions))))
+        sys.exit(1)
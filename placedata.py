@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+
+"""
+placedata.py - Place data processing for the Weather Forecast build script.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import hashlib, json, math, os, re, struct, unicodedata
+
+# Letters that are not decomposed into a base letter and an accent by
+# Unicode normalisation. The same table is used by the application when it
+# normalises the text entered by the user.
+folded_letters = {
+    u"æ": u"ae", u"ø": u"o", u"œ": u"oe", u"ß": u"ss",
+    u"đ": u"d", u"ð": u"d", u"ł": u"l", u"þ": u"th",
+    u"ı": u"i"
+    }
+
+separators = re.compile(u"[\\W_]+", re.UNICODE)
+
+def normalise(text):
+
+    # Convert the text to lower case, remove any accents and replace the
+    # letters above so that, for example, "Tromsø" and "tromso" are the same.
+    text = unicodedata.normalize("NFD", text.lower())
+
+    output = []
+    for c in text:
+        if unicodedata.category(c).startswith("M"):
+            continue
+        output.append(folded_letters.get(c, c))
+
+    return u"".join(output)
+
+def tokens(text):
+
+    return filter(None, separators.split(normalise(text)))
+
+
+class Place:
+
+    """Describes a place that forecasts can be obtained for. The display
+    name is shown to the user and the spec is the path of the place on the
+    yr.no server. The name is the name of the place itself and the areas are
+    the names of the municipality, county or country it is in. Only places
+    that are searchable are included in the search index. Places with lower
+    priorities are more important. The place type, such as "Church" or
+    "Village", is used to tell apart places with the same name in the same
+    area."""
+
+    def __init__(self, display_name, spec, name, areas, latitude, longitude,
+                 searchable = True, priority = 0, place_type = u""):
+
+        self.display_name = display_name
+        self.spec = spec
+        self.name = name
+        self.areas = areas
+        self.latitude = latitude
+        self.longitude = longitude
+        self.searchable = searchable
+        self.priority = priority
+        self.place_type = place_type
+
+    def to_list(self):
+
+        return [self.display_name, self.spec, self.name, self.areas,
+                self.latitude, self.longitude, self.searchable, self.priority,
+                self.place_type]
+
+
+def population_priority(population):
+
+    # Give places in the world data file priorities that are comparable to
+    # those of places in the Norwegian one, where the largest cities have
+    # priorities below zero and most towns have priorities around ten.
+    try:
+        population = int(population)
+    except ValueError:
+        population = 0
+
+    return 60 - int(10 * math.log10(population + 1))
+
+
+# Increase this when the format of the place cache changes.
+CACHE_VERSION = 2
+
+def file_hash(path):
+
+    h = hashlib.sha1()
+    f = open(path, "rb")
+
+    while True:
+        data = f.read(65536)
+        if not data:
+            break
+        h.update(data)
+
+    f.close()
+    return h.hexdigest()
+
+
+def load_places(cache_path, sources, reader):
+
+    """Returns the list of places read from the source files by the reader
+    function, or from the cache file at the given path if none of the source
+    files have changed since it was written. The paths of any files that
+    affect the places that are read, including those of the code that reads
+    them, should be included in the list of sources."""
+
+    hashes = dict(map(lambda path: (path, file_hash(path)), sources))
+
+    try:
+        cache = json.load(open(cache_path))
+        if cache["version"] == CACHE_VERSION and cache["sources"] == hashes:
+            return map(lambda values: Place(*values), cache["places"])
+    except (IOError, ValueError, KeyError):
+        pass
+
+    places = reader()
+
+    cache = {"version": CACHE_VERSION, "sources": hashes,
+             "places": map(lambda place: place.to_list(), places)}
+    write_file(cache_path, json.dumps(cache))
+
+    return places
+
+
+# Fields of the place that a token was found in. Matches on the name of the
+# place are ranked above matches on the names of the areas it is in.
+NAME_FIELD = 0
+AREA_FIELD = 1
+
+def write_file(path, data):
+
+    directory = os.path.split(path)[0]
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    f = open(path, "wb")
+    f.write(data)
+    f.close()
+
+
+def write_place_table(path, places):
+
+    """Writes a table of place names and specifications for the list of
+    places to the file at the given path. The places must be sorted by name
+    so that the application can find a place with a binary search.
+
+    The file starts with a header containing the string "WFPT", the format
+    version and the number of places. This is followed by a table of offsets
+    to the places. Each place is stored as its latitude and longitude in
+    degrees as 32-bit floats, followed by its UTF-8 encoded name and its
+    specification, each preceded by an unsigned 16-bit length.
+
+    All numbers are stored in big-endian order."""
+
+    header_size = 12
+    offset = header_size + 4 * len(places)
+    offsets = []
+    records = []
+
+    for place in places:
+
+        display_name = place.display_name.encode("utf8")
+        spec = place.spec.encode("utf8")
+
+        record = struct.pack(">ff", place.latitude, place.longitude) + \
+                 struct.pack(">H", len(display_name)) + display_name + \
+                 struct.pack(">H", len(spec)) + spec
+        offsets.append(offset)
+        records.append(record)
+        offset += len(record)
+
+    write_file(path, b"WFPT" + struct.pack(">ii", 2, len(places)) + \
+               struct.pack(">%ii" % len(offsets), *offsets) + b"".join(records))
+
+
+def write_search_index(path, places):
+
+    """Writes a search index for the searchable places in the list to the
+    file at the given path. The position of each place in the list is used
+    to refer to it, as in the place table.
+
+    The searchable places are ranked by priority, then by name, and the
+    index refers to them by rank so that the application can return the
+    most important matches without sorting them.
+
+    The file starts with a header containing the string "WFPI", the format
+    version, the number of ranked places and the number of tokens. This is
+    followed by a table of the numbers of the places in order of rank, then
+    a table of offsets to the tokens, which are sorted by their UTF-8
+    encoding so that the range of tokens with a given prefix can be found
+    with a binary search. Each token is stored as an unsigned byte holding
+    its length, the UTF-8 encoded token itself, a byte holding the field it
+    was found in and the rank of the place.
+
+    All numbers are stored in big-endian order."""
+
+    ranked = filter(lambda number: places[number].searchable,
+                    range(len(places)))
+    ranked.sort(key = lambda number: (places[number].priority,
+                                      places[number].display_name))
+
+    entries = set()
+
+    for rank, number in enumerate(ranked):
+
+        place = places[number]
+
+        for token in tokens(place.name):
+            entries.add((token.encode("utf8")[:255], NAME_FIELD, rank))
+
+        for area in place.areas:
+            for token in tokens(area):
+                entries.add((token.encode("utf8")[:255], AREA_FIELD, rank))
+
+    entries = sorted(entries)
+
+    header_size = 16
+    offset = header_size + 4 * len(ranked) + 4 * len(entries)
+    offsets = []
+    records = []
+
+    for token, field, rank in entries:
+        record = struct.pack(">B", len(token)) + token + \
+                 struct.pack(">Bi", field, rank)
+        offsets.append(offset)
+        records.append(record)
+        offset += len(record)
+
+    write_file(path, b"WFPI" + struct.pack(">iii", 2, len(ranked), len(entries)) + \
+               struct.pack(">%ii" % len(ranked), *ranked) + \
+               struct.pack(">%ii" % len(offsets), *offsets) + b"".join(records))
+
+
+def make_catalogue(places):
+
+    """Returns a list of the places sorted by display name, making the names
+    of places that would otherwise have the same display name unique.
+
+    If only one of the places with the same name is searchable, or one is
+    more important than all the others, it keeps the name so that it can
+    still be found by it. The names of the others include the names of the
+    areas they are in, adding their place types and then numbers only when
+    these are needed to tell them apart. No place is left out."""
+
+    groups = {}
+    for place in places:
+        groups.setdefault(place.display_name, []).append(place)
+
+    catalogue = []
+
+    for display_name, group in groups.items():
+
+        if len(group) > 1:
+            main = main_place(group)
+            if main:
+                group.remove(main)
+                catalogue.append(main)
+
+            qualify_names(group, 1, catalogue)
+        else:
+            catalogue += group
+
+    catalogue.sort(key = lambda place: place.display_name)
+    return catalogue
+
+
+def main_place(group):
+
+    # Return the only searchable place in a group of places with the same
+    # name, or the one with the highest priority, or None if there is no
+    # such place.
+    searchable = [place for place in group if place.searchable]
+    if len(searchable) == 1:
+        return searchable[0]
+
+    if not searchable:
+        searchable = group
+
+    searchable.sort(key = lambda place: place.priority)
+    if searchable[0].priority < searchable[1].priority:
+        return searchable[0]
+
+    return None
+
+
+def qualify_names(group, depth, catalogue):
+
+    # Give the places in the group names that include the first areas that
+    # they are in, only including more areas, then the place type, for the
+    # places whose names are still the same. Places with the same name at
+    # the greatest depth are numbered in order of priority.
+    names = {}
+    for place in group:
+        names.setdefault(qualified_name(place, depth), []).append(place)
+
+    for name, same in names.items():
+
+        if len(same) == 1:
+            same[0].display_name = name
+            catalogue.append(same[0])
+
+        elif depth < 3:
+            qualify_names(same, depth + 1, catalogue)
+
+        else:
+            same.sort(key = lambda place: (place.priority, place.spec))
+            for i, place in enumerate(same):
+                place.display_name = qualified_name(place, depth, i + 1)
+                catalogue.append(place)
+
+
+def qualified_name(place, depth, number = 0):
+
+    # Return a display name including the names of the first areas that the
+    # place is in, leaving the last area, usually the country, at the end.
+    # The country is separated by the last comma in the name. At the
+    # greatest depth the place type is included, followed by the number of
+    # the place if one is given.
+    qualifiers = place.areas[:-1][:depth]
+    if depth > 2 and place.place_type:
+        qualifiers.append(place.place_type)
+    if number:
+        qualifiers.append(str(number))
+
+    if not qualifiers:
+        return place.display_name
+
+    return u"%s (%s), %s" % (place.name, u", ".join(qualifiers),
+                             place.areas[-1])
+
+
+def unit_vector(latitude, longitude):
+
+    # Return the position of a point on the surface of a unit sphere. The
+    # straight line distances between these points increase with the great
+    # circle distances between the places, so they can be compared instead.
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon),
+            math.sin(lat))
+
+
+def write_spatial_index(path, places):
+
+    """Writes a k-d tree containing the positions of the places in the list
+    to the file at the given path, referring to each place by its position
+    in the list, as in the place table.
+
+    The file starts with a header containing the string "WFPS", the format
+    version and the number of places. This is followed by the nodes of the
+    tree, each containing the x, y and z coordinates of a place on the unit
+    sphere as 32-bit floats, followed by the number of the place.
+
+    The tree is balanced and stored without links. The root of each subtree
+    is the middle node of its range, with the nodes before it in one subtree
+    and those after it in the other. The nodes at each depth divide their
+    ranges along the x, y and z axes in turn.
+
+    All numbers are stored in big-endian order."""
+
+    points = []
+    for number, place in enumerate(places):
+        points.append(unit_vector(place.latitude, place.longitude) + (number,))
+
+    nodes = [None] * len(points)
+
+    # Build the tree without recursion, keeping a stack of ranges to fill.
+    stack = [(0, len(points), 0, points)]
+
+    while stack:
+
+        start, end, axis, subset = stack.pop()
+        if start == end:
+            continue
+
+        subset.sort(key = lambda point: point[axis])
+        middle = (start + end) // 2
+        i = middle - start
+        nodes[middle] = subset[i]
+
+        stack.append((start, middle, (axis + 1) % 3, subset[:i]))
+        stack.append((middle + 1, end, (axis + 1) % 3, subset[i + 1:]))
+
+    data = [b"WFPS", struct.pack(">ii", 1, len(nodes))]
+    for x, y, z, number in nodes:
+        data.append(struct.pack(">fffi", x, y, z, number))
+
+    write_file(path, b"".join(data))
@@ -0,0 +1,365 @@
+"""
+forecastcache.py - A persistent forecast cache for the Weather Forecast
+                   application.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from java.io import BufferedInputStream, BufferedReader, Closeable, File, \
+                    FileInputStream, FileNotFoundException, FileOutputStream, \
+                    FileReader, FileWriter, InputStream, IOException
+from java.lang import InterruptedException, Long, NumberFormatException, \
+                      Object, Runnable, String, Thread
+from java.net import URLEncoder
+from java.util import List, Map
+from android.content import Context
+
+class ForecastCache(Object):
+
+    # Forecast documents are stored in the application's cache directory,
+    # one file per place specification, together with an index file that
+    # records the values needed to revalidate each document with the server.
+    # The index is kept in least recently used order so that the oldest
+    # documents can be discarded when the total size exceeds the limit.
+    #
+    # Each document expires at the next update time given in it, but not
+    # before minAge or after maxAge milliseconds have passed since it was
+    # obtained or revalidated.
+    #
+    # The index is read in a background thread when the cache is created,
+    # and methods that use it wait for it to be read. Changes to it are only
+    # written when writeIndex is called.
+    
+    __interfaces__ = [Runnable]
+    
+    __fields__ = {"entries": Map(String, CacheEntry), "order": List(String),
+                  "maxSize": long, "totalSize": long,
+                  "minAge": long, "maxAge": long,
+                  "loader": Thread, "dirty": bool}
+    
+    @args(void, [Context, long, long, long])
+    def __init__(self, context, maxSize, minAge, maxAge):
+    
+        Object.__init__(self)
+        
+        self.maxSize = maxSize
+        self.minAge = minAge
+        self.maxAge = maxAge
+        self.totalSize = 0
+        self.entries = {}
+        self.order = []
+        self.dirty = False
+        
+        self.directory = File(context.getCacheDir(), "forecasts")
+        
+        self.loader = Thread(self)
+        self.loader.start()
+    
+    def run(self):
+    
+        if not self.directory.exists():
+            self.directory.mkdirs()
+        
+        self.readIndex()
+        self.removeOrphans()
+    
+    def load(self):
+    
+        # Wait for the index to be read if this has not already happened.
+        # This is only called from the UI thread.
+        if self.loader == None:
+            return
+        
+        try:
+            self.loader.join()
+        except InterruptedException:
+            pass
+        
+        self.loader = None
+    
+    def readIndex(self):
+    
+        f = File(self.directory, "index.txt")
+        
+        try:
+            stream = BufferedReader(FileReader(f))
+            while True:
+            
+                line = stream.readLine()
+                if line == None:
+                    break
+                
+                # spec, ETag, Last-Modified, last update, next update,
+                # time fetched
+                pieces = line.split("\t")
+                
+                if len(pieces) < 6:
+                    continue
+                
+                spec = pieces[0]
+                dataFile = self.getFile(spec)
+                if not dataFile.exists():
+                    continue
+                
+                try:
+                    entry = CacheEntry(spec, pieces[1], pieces[2],
+                        Long.parseLong(pieces[3]), Long.parseLong(pieces[4]),
+                        Long.parseLong(pieces[5]), dataFile.length())
+                except NumberFormatException:
+                    continue
+                
+                self.entries[spec] = entry
+                self.order.add(spec)
+                self.totalSize += entry.size
+            
+            stream.close()
+        
+        except FileNotFoundException:
+            pass
+    
+    def writeIndex(self):
+    
+        # Write the index if it has changed since it was read or written.
+        self.load()
+        if not self.dirty:
+            return
+        
+        self.dirty = False
+        f = File(self.directory, "index.txt")
+        
+        try:
+            stream = FileWriter(f)
+            
+            for spec in self.order:
+                entry = self.entries[spec]
+                stream.write(spec + "\t" + entry.etag + "\t" + \
+                             entry.lastModified + "\t" + \
+                             str(entry.lastUpdate) + "\t" + \
+                             str(entry.nextUpdate) + "\t" + \
+                             str(entry.time) + "\n")
+            
+            stream.flush()
+            stream.close()
+        
+        except IOException:
+            pass
+    
+    def removeOrphans(self):
+    
+        # Delete any files left behind by interrupted downloads or by entries
+        # that were dropped from the index.
+        files = {"index.txt"}
+        for spec in self.order:
+            files.add(self.getFile(spec).getName())
+        
+        for f in self.directory.listFiles():
+            if not files.contains(f.getName()):
+                f.delete()
+    
+    @args(File, [String])
+    def getFile(self, spec):
+    
+        return File(self.directory, URLEncoder.encode(spec, "UTF-8") + ".xml")
+    
+    @args(File, [String])
+    def getTempFile(self, spec):
+    
+        return File(self.directory, URLEncoder.encode(spec, "UTF-8") + ".part")
+    
+    @args(CacheEntry, [String])
+    def getEntry(self, spec):
+    
+        self.load()
+        
+        try:
+            return self.entries[spec]
+        except KeyError:
+            return None
+    
+    @args(InputStream, [String])
+    def openStream(self, spec):
+    
+        try:
+            return BufferedInputStream(FileInputStream(self.getFile(spec)))
+        except FileNotFoundException:
+            return None
+    
+    @args(InputStream, [String])
+    def openTempStream(self, spec):
+    
+        try:
+            return BufferedInputStream(FileInputStream(self.getTempFile(spec)))
+        except FileNotFoundException:
+            return None
+    
+    @args(bool, [String, InputStream])
+    def download(self, spec, input):
+    
+        # Copy the document into a temporary file. This is called from a
+        # background thread, so it must not modify the index. The streams are
+        # always closed and the temporary file is deleted if the copy fails.
+        f = self.getTempFile(spec)
+        
+        try:
+            output = FileOutputStream(f)
+        except IOException:
+            self.close(input)
+            return False
+        
+        downloaded = False
+        
+        try:
+            buf = array(byte, 4096)
+            
+            while True:
+                length = input.read(buf)
+                if length == -1:
+                    break
+                output.write(buf, 0, length)
+            
+            output.close()
+            downloaded = True
+        
+        except IOException:
+            pass
+        
+        finally:
+            self.close(output)
+            self.close(input)
+        
+        if not downloaded:
+            f.delete()
+        
+        return downloaded
+    
+    @args(void, [Closeable])
+    def close(self, stream):
+    
+        # Close a stream, ignoring any error because there is nothing more to
+        # read from it or write to it.
+        try:
+            stream.close()
+        except IOException:
+            pass
+    
+    @args(void, [String, String, String, long, long, long])
+    def commit(self, spec, etag, lastModified, lastUpdate, nextUpdate, time):
+    
+        # Replace any existing document for the place with the one that was
+        # downloaded into the temporary file.
+        self.remove(spec)
+        
+        tempFile = self.getTempFile(spec)
+        dataFile = self.getFile(spec)
+        
+        if not tempFile.renameTo(dataFile):
+            tempFile.delete()
+            return
+        
+        entry = CacheEntry(spec, etag, lastModified, lastUpdate, nextUpdate,
+                           time, dataFile.length())
+        self.entries[spec] = entry
+        self.order.add(spec)
+        self.totalSize += entry.size
+        
+        self.evict()
+        self.dirty = True
+    
+    @args(long, [CacheEntry])
+    def getExpiryTime(self, entry):
+    
+        expires = entry.nextUpdate
+        
+        # Documents without a next update time, or with one that has already
+        # passed, are kept for the minimum time before being checked again.
+        if expires < entry.time + self.minAge:
+            expires = entry.time + self.minAge
+        elif expires > entry.time + self.maxAge:
+            expires = entry.time + self.maxAge
+        
+        return expires
+    
+    @args(bool, [CacheEntry, long])
+    def isFresh(self, entry, time):
+    
+        return time < self.getExpiryTime(entry)
+    
+    @args(void, [String])
+    def discard(self, spec):
+    
+        self.getTempFile(spec).delete()
+    
+    @args(void, [String, long])
+    def validated(self, spec, time):
+    
+        # Record that the server confirmed that the stored document is still
+        # current.
+        entry = self.getEntry(spec)
+        if entry == None:
+            return
+        
+        entry.time = time
+        self.touch(spec)
+    
+    @args(void, [String])
+    def touch(self, spec):
+    
+        # Move the place to the most recently used end of the list.
+        self.load()
+        if self.order.remove(spec):
+            self.order.add(spec)
+            self.dirty = True
+    
+    @args(void, [String])
+    def remove(self, spec):
+    
+        entry = self.getEntry(spec)
+        if entry == None:
+            return
+        
+        self.entries.remove(spec)
+        self.order.remove(spec)
+        self.totalSize -= entry.size
+        self.getFile(spec).delete()
+        self.dirty = True
+    
+    def evict(self):
+    
+        # Discard the least recently used documents until the cache fits in
+        # the space allowed, but always keep the most recent one.
+        while self.totalSize > self.maxSize and len(self.order) > 1:
+            self.remove(self.order[0])
+
+
+class CacheEntry(Object):
+
+    __fields__ = {"spec": String, "etag": String, "lastModified": String,
+                  "lastUpdate": long, "nextUpdate": long, "time": long,
+                  "size": long}
+    
+    @args(void, [String, String, String, long, long, long, long])
+    def __init__(self, spec, etag, lastModified, lastUpdate, nextUpdate, time,
+                 size):
+        
+        Object.__init__(self)
+        
+        self.spec = spec
+        self.etag = etag
+        self.lastModified = lastModified
+        self.lastUpdate = lastUpdate
+        self.nextUpdate = nextUpdate
+        self.time = time
+        self.size = size
@@ -0,0 +1,240 @@
+"""
+forecastclient.py - HTTP requests for the Weather Forecast application.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from java.io import BufferedInputStream, FilterInputStream, InputStream
+from java.lang import Double, Math, NumberFormatException, Object, String, \
+                      StringBuilder, System
+from java.net import HttpURLConnection, URL
+from java.util.zip import GZIPInputStream
+from android.os import Trace
+
+class ForecastClient(Object):
+
+    # Requests documents from the server, asking for them to be compressed
+    # and giving up if the server cannot be reached or stops responding
+    # within the timeouts, given in milliseconds.
+    #
+    # Connections are kept open and reused by HttpURLConnection as long as
+    # each response is read to the end and closed instead of disconnected.
+    #
+    # Places are usually given as paths on the yr.no server, but places
+    # given by position, as "position/<latitude>/<longitude>/<name>", are
+    # fetched from the locationforecast service. Their positions are moved
+    # to the nearest point on a grid with the given spacing in thousandths
+    # of a degree so that places near each other share the same document.
+    
+    __fields__ = {"connectTimeout": int, "readTimeout": int, "gridSize": int}
+    
+    @args(void, [int, int, int])
+    def __init__(self, connectTimeout, readTimeout, gridSize):
+    
+        Object.__init__(self)
+        
+        self.connectTimeout = connectTimeout
+        self.readTimeout = readTimeout
+        self.gridSize = gridSize
+    
+    @args(String, [String])
+    def getKey(self, spec):
+    
+        # Return the key used to fetch and store the document for a place.
+        if not spec.startsWith("position/"):
+            return spec
+        
+        pieces = spec.split("/")
+        if len(pieces) < 3:
+            return spec
+        
+        try:
+            latitude = Double.parseDouble(pieces[1])
+            longitude = Double.parseDouble(pieces[2])
+        except NumberFormatException:
+            return spec
+        
+        return "position/" + self.snap(latitude) + "/" + self.snap(longitude)
+    
+    @args(String, [String])
+    def getName(self, spec):
+    
+        # Return the name given to a place given by position, or an empty
+        # string for other places.
+        if not spec.startsWith("position/"):
+            return ""
+        
+        pieces = spec.split("/")
+        if len(pieces) < 4:
+            return ""
+        
+        return pieces[3]
+    
+    @args(String, [String])
+    def getURL(self, key):
+    
+        if key.startsWith("position/"):
+            pieces = key.split("/")
+            return "https://api.met.no/weatherapi/locationforecast/1.9/?lat=" + \
+                   pieces[1] + ";lon=" + pieces[2]
+        else:
+            return "https://www.yr.no/place/" + key + "/forecast.xml"
+    
+    @args(String, [double])
+    def snap(self, value):
+    
+        # Round the value to the grid and format it with three decimal
+        # places, independently of the locale.
+        n = Math.round(value * 1000 / self.gridSize) * self.gridSize
+        
+        b = StringBuilder()
+        if n < 0:
+            b.append("-")
+            n = -n
+        
+        b.append(n / 1000)
+        b.append(".")
+        
+        fraction = str(1000 + (n % 1000))
+        b.append(fraction[1:])
+        return b.toString()
+    
+    @args(ForecastResponse, [String, String, String])
+    def open(self, spec, etag, lastModified):
+    
+        # The time taken by each stage of the request is recorded in the
+        # response and shown in system traces. The time taken to connect
+        # includes any DNS lookup.
+        url = URL(spec)
+        
+        started = System.nanoTime()
+        
+        connection = CAST(url.openConnection(), HttpURLConnection)
+        connection.setInstanceFollowRedirects(True)
+        connection.setConnectTimeout(self.connectTimeout)
+        connection.setReadTimeout(self.readTimeout)
+        
+        # Asking for gzip explicitly means that the stream is not decoded
+        # automatically, but it lets us count the bytes that were received.
+        connection.setRequestProperty("Accept-Encoding", "gzip")
+        
+        # If there is a stored copy of the document then only ask for it to
+        # be sent if it has changed since the copy was obtained.
+        if etag != "":
+            connection.setRequestProperty("If-None-Match", etag)
+        if lastModified != "":
+            connection.setRequestProperty("If-Modified-Since", lastModified)
+        
+        # Connecting takes no time if a connection is reused.
+        Trace.beginSection("connect")
+        try:
+            connection.connect()
+        finally:
+            Trace.endSection()
+        
+        connected = System.nanoTime()
+        
+        Trace.beginSection("first byte")
+        try:
+            code = connection.getResponseCode()
+        finally:
+            Trace.endSection()
+        
+        response = ForecastResponse(code)
+        response.connectTime = connected - started
+        response.firstByteTime = System.nanoTime() - connected
+        
+        if code == HttpURLConnection.HTTP_NOT_MODIFIED:
+            # Close the empty body so that the connection can be reused.
+            stream = connection.getInputStream()
+            if stream != None:
+                stream.close()
+            return response
+        
+        response.counter = CountingInputStream(connection.getInputStream())
+        stream = BufferedInputStream(response.counter)
+        
+        if connection.getContentEncoding() == "gzip":
+            response.stream = GZIPInputStream(stream)
+        else:
+            response.stream = stream
+        
+        value = connection.getHeaderField("ETag")
+        if value != None:
+            response.etag = value
+        
+        value = connection.getHeaderField("Last-Modified")
+        if value != None:
+            response.lastModified = value
+        
+        return response
+
+
+class ForecastResponse(Object):
+
+    # The stream is None if the document has not changed. Times are given
+    # in nanoseconds.
+    
+    __fields__ = {"code": int, "stream": InputStream,
+                  "counter": CountingInputStream,
+                  "etag": String, "lastModified": String,
+                  "connectTime": long, "firstByteTime": long}
+    
+    @args(void, [int])
+    def __init__(self, code):
+    
+        Object.__init__(self)
+        
+        self.code = code
+        self.stream = None
+        self.counter = None
+        self.etag = ""
+        self.lastModified = ""
+        self.connectTime = 0
+        self.firstByteTime = 0
+    
+    @args(long, [])
+    def received(self):
+    
+        # Return the number of bytes of the body received so far, before it
+        # was decompressed.
+        if self.counter == None:
+            return 0
+        
+        return self.counter.count
+
+
+class CountingInputStream(FilterInputStream):
+
+    # Counts the bytes read in blocks from the underlying stream. It is
+    # wrapped in a BufferedInputStream, so single bytes are never read.
+    
+    __fields__ = {"count": long}
+    
+    @args(void, [InputStream])
+    def __init__(self, stream):
+    
+        FilterInputStream.__init__(self, stream)
+        self.count = 0
+    
+    @args(int, [[byte], int, int])
+    def read(self, buffer, offset, length):
+    
+        n = FilterInputStream.read(self, buffer, offset, length)
+        if n > 0:
+            self.count += n
+        
+        return n
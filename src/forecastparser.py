@@ -18,48 +18,99 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from java.io import InputStream
-from java.lang import Object, String
-from java.text import DateFormat, ParsePosition, SimpleDateFormat
-from java.util import Date, GregorianCalendar, List, TimeZone
+from java.lang import Character, Double, Float, Integer, Long, Math, \
+                      NumberFormatException, Object, String
+from java.util import Collections, List, Map
 from android.content.res import Resources
 from android.view import View
 from org.xmlpull.v1 import XmlPullParser, XmlPullParserFactory
 
 from app_resources import R
 
-class ForecastParser(Object):
+class SymbolTable(Object):
 
+    # Contains the resource IDs of the day, night and polar versions of each
+    # symbol, in that order, indexed by symbol number. Symbols without
+    # different versions have the same ID in each column and unused numbers
+    # have zeros. The build script records the names of the images because
+    # their IDs are only allocated when the resources are packaged, so the
+    # IDs are looked up once when the application starts.
+    
+    __fields__ = {"ids": [int]}
+    
     @args(void, [Resources])
     def __init__(self, resources):
     
         Object.__init__(self)
         
-        # Obtain the keys and values to be used to create the symbols
-        # dictionary from the application's resources.
-        symbols = resources.getStringArray(R.array.symbols)
-        resourceIDs = resources.getIntArray(R.array.resourceIDs)
+        names = resources.getStringArray(R.array.symbolNames)
+        package = resources.getResourcePackageName(R.array.symbolNames)
+        
+        self.ids = array(int, len(names))
+        i = 0
+        while i < len(names):
+            if names[i].length() > 0:
+                self.ids[i] = resources.getIdentifier(names[i], "drawable",
+                                                      package)
+            i += 1
+
+
+class ForecastParser(Object):
+
+    __fields__ = {"symbolTable": [int],
+                  "pending": Map(Long, Forecast),
+                  "strings": Map(String, String),
+                  "sunrise": long, "sunset": long, "day": long,
+                  "dayRise": long, "daySet": long}
+    
+    @args(void, [SymbolTable])
+    def __init__(self, symbols):
+    
+        Object.__init__(self)
         
-        self.symbols = dict(symbols, resourceIDs)
+        # The table is shared between parsers and is only read.
+        self.symbolTable = symbols.ids
+        self.pending = {}
+        self.strings = {}
+        self.setSunTimes(0, 0)
     
-    @args(List(Forecast), [InputStream])
-    def parse(self, stream):
+    @args(ForecastDocument, [InputStream, ForecastListener])
+    def parse(self, stream, listener):
     
         factory = XmlPullParserFactory.newInstance()
         parser = factory.newPullParser()
         parser.setInput(stream, None)
         
+        document = ForecastDocument()
+        
+        # Find the root element. Documents from the api.met.no
+        # locationforecast services record when they were created in an
+        # attribute of this element, but those from yr.no do not.
+        eventType = parser.getEventType()
+        while eventType != XmlPullParser.START_TAG:
+            eventType = parser.next()
+            if eventType == XmlPullParser.END_DOCUMENT:
+                return document
+        
+        if parser.getAttributeValue(None, "created") != None:
+            self.parsePointData(parser, document, listener)
+        else:
+            self.parseTabular(parser, document, listener)
+        
+        document.forecasts = Collections.unmodifiableList(document.forecasts)
+        return document
+    
+    @args(void, [XmlPullParser, ForecastDocument, ForecastListener])
+    def parseTabular(self, parser, document, listener):
+    
+        # Read a yr.no forecast.xml document.
         eventType = parser.getEventType()
         section = ""
         sections = {"location", "credit", "tabular"}
         
-        dateFormat = SimpleDateFormat("yyyy-MM-dd'T'HH:mm:ss")
-        dateFormat.setTimeZone(TimeZone.getTimeZone("UTC"))
-        sunrise = Date()
-        sunset = Date()
+        self.setSunTimes(0, 0)
         
-        place = ""
-        credit = ""
-        forecasts = []
+        offset = 0
         forecast = Forecast()
         
         while eventType != XmlPullParser.END_DOCUMENT:
@@ -79,58 +130,83 @@ class ForecastParser(Object):
                         while eventType != XmlPullParser.TEXT:
                             eventType = parser.next()
                         
-                        place = parser.getText()
+                        document.place = parser.getText()
                     
                     elif name == "link":
-                        credit = parser.getAttributeValue(None, "text")
+                        document.credit = parser.getAttributeValue(None, "text")
+                    
+                    elif name == "timezone":
+                        offset = Integer.parseInt(parser.getAttributeValue(
+                            None, "utcoffsetMinutes"))
                     
                     elif name == "time":
                     
                         forecast = Forecast()
-                        forecast.place = place
-                        forecast.credit = credit
                         
                         from_ = parser.getAttributeValue(None, "from")
                         to_ = parser.getAttributeValue(None, "to")
                         
-                        forecast.from_ = dateFormat.parse(from_, ParsePosition(0))
-                        forecast.to_ = dateFormat.parse(to_, ParsePosition(0))
+                        forecast.from_ = self.parseTime(from_)
+                        forecast.to_ = self.parseTime(to_)
                     
                     elif name == "symbol":
                     
-                        forecast.description = parser.getAttributeValue(None, "name")
-                        symbol = parser.getAttributeValue(None, "numberEx")
-                        
-                        forecast.midDate = Date(forecast.from_.getTime()/2 + \
-                                                forecast.to_.getTime()/2)
-                        try:
-                            forecast.symbol = self.symbols[symbol]
-                            continue
-                        except KeyError:
-                            pass
+                        forecast.description = self.intern(
+                            parser.getAttributeValue(None, "name"))
+                        i = self.findSymbol(
+                            parser.getAttributeValue(None, "numberEx"))
                         
-                        if self.isDayTime(forecast.midDate, sunrise, sunset):
-                            symbol += "d"
-                        else:
-                            symbol += "n"
+                        forecast.midDate = forecast.from_/2 + forecast.to_/2
                         
-                        try:
-                            forecast.symbol = self.symbols[symbol]
-                        except KeyError:
+                        if i == -1:
                             forecast.symbol = -1
+                        elif self.symbolTable[i] == self.symbolTable[i + 1] or \
+                             self.isDayTime(forecast.midDate):
+                            forecast.symbol = self.symbolTable[i]
+                        else:
+                            forecast.symbol = self.symbolTable[i + 1]
                     
                     elif name == "windSpeed":
-                        forecast.windSpeed = parser.getAttributeValue(None, "name")
+                        self.readWind(parser, forecast)
                     
                     elif name == "temperature":
-                        forecast.temperature = parser.getAttributeValue(None, "value")
-                        forecast.temperatureUnit = parser.getAttributeValue(None, "unit")
+                        self.readTemperature(parser, forecast)
+                    
+                    elif name == "precipitation":
+                        forecast.precipitation = self.readFloat(parser, "value")
+                    
+                    elif name == "pressure":
+                        forecast.pressure = self.readFloat(parser, "value")
                 
                 elif name == "sun":
                     rise = parser.getAttributeValue(None, "rise")
                     sset = parser.getAttributeValue(None, "set")
-                    sunrise = dateFormat.parse(rise, ParsePosition(0))
-                    sunset = dateFormat.parse(sset, ParsePosition(0))
+                    
+                    if rise != None and sset != None:
+                        document.sunrise = self.parseTime(rise) % 86400000
+                        document.sunset = self.parseTime(sset) % 86400000
+                    
+                    # In polar regions the sun may stay above or below the
+                    # horizon for the whole day.
+                    elif parser.getAttributeValue(None, "never_set") != None:
+                        document.sunrise = 0
+                        document.sunset = 86400000
+                    
+                    self.setSunTimes(document.sunrise, document.sunset)
+                
+                elif name == "lastupdate" or name == "nextupdate":
+                    while eventType != XmlPullParser.TEXT:
+                        eventType = parser.next()
+                    
+                    time = self.parseTime(parser.getText())
+                    if time != 0:
+                        # The update times are given in the local time of the
+                        # place, so convert them to UTC.
+                        time -= offset * 60000
+                        if name == "lastupdate":
+                            document.lastUpdate = time
+                        else:
+                            document.nextUpdate = time
             
             elif eventType == XmlPullParser.END_TAG:
             
@@ -140,47 +216,363 @@ class ForecastParser(Object):
                     section = ""
                 
                 elif section == "tabular" and name == "time":
-                    forecasts.add(forecast)
-        
-        return forecasts
+                    document.forecasts.add(forecast)
+                    
+                    # Let the listener handle each forecast as it is read.
+                    if listener != None:
+                        listener.forecastParsed(document, forecast)
     
-    @args(bool, [Date, Date, Date])
-    def isDayTime(self, forecastDate, sunrise, sunset):
+    @args(void, [XmlPullParser, ForecastDocument, ForecastListener])
+    def parsePointData(self, parser, document, listener):
     
-        # Only check the time, not the date, of the forecast against the
-        # sunrise and sunset times.
+        # Read an api.met.no locationforecast or locationforecastlts document.
+        # Each time element either describes the conditions at a single time
+        # (temperature, wind, humidity, pressure and cloudiness) or over a
+        # period (precipitation and symbol). A forecast is created for each
+        # time with conditions, combining them with those for the shortest
+        # period that starts at that time. Since the periods for a time occur
+        # in order of their end times, the first one found is the shortest.
+        # Forecasts are indexed by their start times so that the two kinds of
+        # element can be combined as they are read.
+        
+        self.pending.clear()
+        document.lastUpdate = self.parseTime(parser.getAttributeValue(None, "created"))
+        document.credit = "Weather forecast from the Norwegian Meteorological Institute"
+        
+        latitude = 0.0
+        longitude = 0.0
+        forecast = None
+        eventType = parser.getEventType()
+        
+        while eventType != XmlPullParser.END_DOCUMENT:
+        
+            eventType = parser.next()
+            
+            if eventType == XmlPullParser.START_TAG:
+            
+                name = parser.getName()
+                
+                if name == "model":
+                    # Use the earliest time that any of the models will be
+                    # run again as the time of the next update.
+                    nextRun = self.parseTime(parser.getAttributeValue(None, "nextrun"))
+                    if nextRun != 0:
+                        if document.nextUpdate == 0 or nextRun < document.nextUpdate:
+                            document.nextUpdate = nextRun
+                
+                elif name == "time":
+                
+                    start = self.parseTime(parser.getAttributeValue(None, "from"))
+                    end = self.parseTime(parser.getAttributeValue(None, "to"))
+                    
+                    try:
+                        forecast = self.pending[start]
+                    except KeyError:
+                        forecast = Forecast()
+                        forecast.from_ = start
+                        self.pending[start] = forecast
+                    
+                    if end != start:
+                        # Ignore all but the shortest period.
+                        if forecast.to_ != 0:
+                            forecast = None
+                        else:
+                            forecast.to_ = end
+                            forecast.midDate = start/2 + end/2
+                
+                elif forecast == None:
+                    continue
+                
+                elif name == "location":
+                    if document.place == "":
+                        lat = parser.getAttributeValue(None, "latitude")
+                        lon = parser.getAttributeValue(None, "longitude")
+                        latitude = Double.parseDouble(lat)
+                        longitude = Double.parseDouble(lon)
+                        document.place = lat + ", " + lon
+                
+                elif name == "temperature":
+                    self.readTemperature(parser, forecast)
+                
+                elif name == "windSpeed":
+                    self.readWind(parser, forecast)
+                
+                elif name == "humidity":
+                    forecast.humidity = self.readFloat(parser, "value")
+                
+                elif name == "pressure":
+                    forecast.pressure = self.readFloat(parser, "value")
+                
+                elif name == "cloudiness":
+                    forecast.cloudiness = self.readFloat(parser, "percent")
+                
+                elif name == "precipitation":
+                    forecast.precipitation = self.readFloat(parser, "value")
+                
+                elif name == "symbol":
+                
+                    forecast.description = self.intern(
+                        parser.getAttributeValue(None, "id"))
+                    i = self.findSymbol(parser.getAttributeValue(None, "number"))
+                    
+                    if i == -1:
+                        forecast.symbol = -1
+                    elif self.symbolTable[i] == self.symbolTable[i + 1] or \
+                         self.isSunUp(forecast.midDate, latitude, longitude):
+                        forecast.symbol = self.symbolTable[i]
+                    else:
+                        forecast.symbol = self.symbolTable[i + 1]
+            
+            elif eventType == XmlPullParser.END_TAG:
+            
+                if parser.getName() == "time" and forecast != None:
+                
+                    # The forecast is complete when the conditions and the
+                    # period have both been read.
+                    if forecast.to_ != 0 and not Float.isNaN(forecast.temperature):
+                        document.forecasts.add(forecast)
                         
-        cal = GregorianCalendar(TimeZone.getTimeZone("UTC"))
-        cal.setTime(forecastDate)
+                        if listener != None:
+                            listener.forecastParsed(document, forecast)
+                    
+                    forecast = None
+        
+        self.pending.clear()
+    
+    @args(void, [XmlPullParser, Forecast])
+    def readTemperature(self, parser, forecast):
+    
+        forecast.temperature = self.readFloat(parser, "value")
+        forecast.temperatureUnit = self.intern(
+            parser.getAttributeValue(None, "unit"))
+    
+    @args(void, [XmlPullParser, Forecast])
+    def readWind(self, parser, forecast):
+    
+        forecast.windSpeed = self.readFloat(parser, "mps")
+        forecast.windName = self.intern(parser.getAttributeValue(None, "name"))
+    
+    @args(float, [XmlPullParser, String])
+    def readFloat(self, parser, attribute):
+    
+        # Return the value of the attribute as a number, or NaN if it is
+        # missing or invalid.
+        value = parser.getAttributeValue(None, attribute)
+        if value == None:
+            return Float.NaN
+        
+        try:
+            return Float.parseFloat(value)
+        except NumberFormatException:
+            return Float.NaN
+    
+    @args(int, [String])
+    def findSymbol(self, text):
+    
+        # Return the index of the row in the symbol table for the symbol
+        # number in the text, or -1 if there is no image for it. Symbols
+        # that are the same at all times have the same day and night IDs.
+        if text == None:
+            return -1
+        
+        number = self.parseNumber(text, 0, text.length())
+        if number < 0 or (number * 3) >= len(self.symbolTable):
+            return -1
+        
+        i = number * 3
+        if self.symbolTable[i] == 0:
+            return -1
+        
+        return i
+    
+    @args(String, [String])
+    def intern(self, s):
+    
+        # Return a shared copy of strings such as descriptions and units that
+        # are repeated many times in each document.
+        if s == None:
+            return None
+        
+        try:
+            return self.strings[s]
+        except KeyError:
+            self.strings[s] = s
+            return s
+    
+    @args(bool, [long, double, double])
+    def isSunUp(self, time, latitude, longitude):
+    
+        # Calculate the elevation of the sun at the given time and place
+        # using the approximate formulae from the Astronomical Almanac, which
+        # are accurate to a few minutes of arc for the current century.
+        d = (time / 86400000.0) - 10957.5       # days since 2000-01-01T12:00Z
+        
+        g = Math.toRadians(357.529 + 0.98560028 * d)
+        q = 280.459 + 0.98564736 * d
+        L = Math.toRadians(q + 1.915 * Math.sin(g) + 0.020 * Math.sin(2 * g))
+        e = Math.toRadians(23.439 - 0.00000036 * d)
+        
+        declination = Math.asin(Math.sin(e) * Math.sin(L))
+        ascension = Math.atan2(Math.cos(e) * Math.sin(L), Math.cos(L))
+        
+        sidereal = 280.46061837 + 360.98564736629 * d + longitude
+        hourAngle = Math.toRadians(sidereal) - ascension
+        
+        phi = Math.toRadians(latitude)
+        elevation = Math.asin(Math.sin(phi) * Math.sin(declination) + \
+            Math.cos(phi) * Math.cos(declination) * Math.cos(hourAngle))
+        
+        # Include the effects of refraction and the size of the sun's disc.
+        return elevation > Math.toRadians(-0.833)
+    
+    @args(long, [String])
+    def parseTime(self, text):
+    
+        # Decode a time in the form yyyy-MM-ddTHH:mm:ss, with an optional Z
+        # suffix, into the number of milliseconds since the epoch, treating
+        # it as a UTC time. If only the date is given then the time at the
+        # start of the day is returned. Invalid times are returned as 0.
+        if text == None or text.length() < 10:
+            return 0
+        
+        year = self.parseNumber(text, 0, 4)
+        month = self.parseNumber(text, 5, 7)
+        day = self.parseNumber(text, 8, 10)
+        
+        if year < 0 or month < 1 or day < 1:
+            return 0
+        
+        # Count the days since the epoch using a year that starts in March
+        # so that leap days fall at the end of it.
+        if month <= 2:
+            year -= 1
+            month += 9
+        else:
+            month -= 3
+        
+        era = year / 400
+        yearOfEra = year - (era * 400)
+        dayOfYear = ((153 * month) + 2)/5 + day - 1
+        dayOfEra = (yearOfEra * 365) + (yearOfEra / 4) - (yearOfEra / 100) + dayOfYear
+        days = long((era * 146097) + dayOfEra - 719468)
         
-        riseCal = GregorianCalendar(TimeZone.getTimeZone("UTC"))
-        riseCal.setTime(sunrise)
-        riseCal.set(cal.get(cal.YEAR), cal.get(cal.MONTH), cal.get(cal.DATE))
+        seconds = days * 86400
         
-        setCal = GregorianCalendar(TimeZone.getTimeZone("UTC"))
-        setCal.setTime(sunset)
-        setCal.set(cal.get(cal.YEAR), cal.get(cal.MONTH), cal.get(cal.DATE))
+        if text.length() >= 19:
+            hours = self.parseNumber(text, 11, 13)
+            minutes = self.parseNumber(text, 14, 16)
+            secs = self.parseNumber(text, 17, 19)
+            
+            if hours < 0 or minutes < 0 or secs < 0:
+                return 0
+            
+            seconds += (hours * 3600) + (minutes * 60) + secs
+        
+        return seconds * 1000
+    
+    @args(int, [String, int, int])
+    def parseNumber(self, text, start, end):
+    
+        # Return the decimal number in the text between the start and end
+        # positions, or -1 if any character is not a digit.
+        value = 0
+        i = start
+        
+        while i < end:
+            digit = Character.digit(text.charAt(i), 10)
+            if digit == -1:
+                return -1
+            
+            value = (value * 10) + digit
+            i += 1
+        
+        return value
+    
+    @args(void, [long, long])
+    def setSunTimes(self, sunrise, sunset):
+    
+        # Record the times of sunrise and sunset as milliseconds since the
+        # start of the day, discarding any previously calculated times.
+        self.sunrise = sunrise
+        self.sunset = sunset
+        self.day = -1
+    
+    @args(bool, [long])
+    def isDayTime(self, time):
+    
+        # Only check the time, not the date, of the forecast against the
+        # sunrise and sunset times. The times are calculated for each day and
+        # reused for the forecasts that follow on the same day.
+        day = time / 86400000
         
-        if cal.compareTo(riseCal) == -1:
-            return False
-        elif cal.compareTo(setCal) == 1:
-            return False
+        if day != self.day:
+            self.day = day
+            self.dayRise = (day * 86400000) + self.sunrise
+            self.daySet = (day * 86400000) + self.sunset
         
-        return True
+        return time >= self.dayRise and time <= self.daySet
 
 
-class Forecast(Object):
+class ForecastListener:
+
+    @args(void, [ForecastDocument, Forecast])
+    def forecastParsed(self, document, forecast):
+        pass
+
 
+class ForecastDocument(Object):
+
+    # The information shared by all the forecasts in a document. The times
+    # of sunrise and sunset are given in milliseconds since the start of the
+    # day and the update times in milliseconds since the epoch.
+    
     __fields__ = {
         "place": String,
         "credit": String,
-        "from_": Date, "to_": Date, "midDate": Date,
+        "sunrise": long, "sunset": long,
+        "lastUpdate": long, "nextUpdate": long,
+        "forecasts": List(Forecast),
+        }
+    
+    def __init__(self):
+    
+        Object.__init__(self)
+        
+        self.place = ""
+        self.credit = ""
+        self.sunrise = 0
+        self.sunset = 0
+        self.lastUpdate = 0
+        self.nextUpdate = 0
+        self.forecasts = []
+
+
+class Forecast(Object):
+
+    # A forecast for a period. Times are given in milliseconds since the
+    # epoch, and values that are not given in the document are NaN.
+    
+    __fields__ = {
+        "from_": long, "to_": long, "midDate": long,
         "symbol": int,
         "description": String,
-        "windSpeed": String,
-        "temperature": String,
+        "windSpeed": float,
+        "windName": String,
+        "temperature": float,
         "temperatureUnit": String,
+        "precipitation": float,
+        "pressure": float,
+        "humidity": float,
+        "cloudiness": float,
         }
     
     def __init__(self):
+    
         Object.__init__(self)
+        
+        self.windSpeed = Float.NaN
+        self.temperature = Float.NaN
+        self.precipitation = Float.NaN
+        self.pressure = Float.NaN
+        self.humidity = Float.NaN
+        self.cloudiness = Float.NaN
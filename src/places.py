@@ -0,0 +1,571 @@
+"""
+places.py - Place name searching for the Weather Forecast application.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from java.io import File, FileInputStream, FileOutputStream, IOException
+from java.lang import Character, Double, Math, Object, String, StringBuilder
+from java.nio import ByteBuffer
+from java.nio.channels import FileChannel
+from java.text import Normalizer
+from java.util import Arrays
+from android.content import Context
+
+from app_resources import R
+
+class ResourceFile(Object):
+
+    # Raw resources may be compressed in the package, so they are copied to
+    # the application's files directory when the package is installed or
+    # updated and mapped into memory from there. Only the pages that are
+    # read are loaded.
+    
+    @args(void, [Context, int, String])
+    def __init__(self, context, id, name):
+    
+        Object.__init__(self)
+        
+        self.context = context
+        self.id = id
+        self.file = File(context.getFilesDir(), name)
+    
+    @args(ByteBuffer, [])
+    def map(self):
+    
+        try:
+            if not self.isCurrent():
+                self.copy()
+            
+            stream = FileInputStream(self.file)
+            try:
+                channel = stream.getChannel()
+                return channel.map(FileChannel.MapMode.READ_ONLY, long(0),
+                                   channel.size())
+            finally:
+                stream.close()
+        
+        except IOException:
+            return ByteBuffer.allocate(0)
+    
+    @args(bool, [])
+    def isCurrent(self):
+    
+        if not self.file.exists():
+            return False
+        
+        manager = self.context.getPackageManager()
+        info = manager.getPackageInfo(self.context.getPackageName(), 0)
+        return self.file.lastModified() > info.lastUpdateTime
+    
+    def copy(self):
+    
+        # Write to a temporary file and rename it so that an incomplete file
+        # is never used. The streams are closed and the temporary file is
+        # deleted if the copy fails.
+        tempFile = File(self.file.getPath() + ".part")
+        
+        input = self.context.getResources().openRawResource(self.id)
+        copied = False
+        
+        try:
+            output = FileOutputStream(tempFile)
+            try:
+                buf = array(byte, 16384)
+                
+                while True:
+                    length = input.read(buf)
+                    if length == -1:
+                        break
+                    output.write(buf, 0, length)
+            finally:
+                output.close()
+            
+            copied = True
+        
+        finally:
+            input.close()
+            if not copied:
+                tempFile.delete()
+        
+        if not tempFile.renameTo(self.file):
+            tempFile.delete()
+            raise IOException("Failed to copy resource")
+
+
+class PlaceData(Object):
+
+    # The table of places and the indexes used to find them by name and by
+    # position. Creating these may involve copying the files they are read
+    # from, so this should be done in a background thread.
+    
+    __fields__ = {"table": PlaceTable, "index": PlaceIndex,
+                  "locator": SpatialIndex}
+    
+    @args(void, [Context])
+    def __init__(self, context):
+    
+        Object.__init__(self)
+        
+        # Map the table of place names and specifications and the indexes
+        # into memory instead of reading them all.
+        self.table = PlaceTable(
+            ResourceFile(context, R.raw.places, "places.bin").map())
+        self.index = PlaceIndex(
+            ResourceFile(context, R.raw.placeindex, "placeindex.bin").map())
+        self.locator = SpatialIndex(
+            ResourceFile(context, R.raw.spatialindex, "spatialindex.bin").map())
+
+
+class PlaceTable(Object):
+
+    # The names, specifications and positions of the places, sorted by
+    # name, created by the build script. See placedata.py for the format.
+    # Each name and specification is only decoded when it is needed.
+    
+    __fields__ = {"data": ByteBuffer, "count": int}
+    
+    @args(void, [ByteBuffer])
+    def __init__(self, data):
+    
+        Object.__init__(self)
+        
+        self.data = data
+        
+        if self.data.capacity() < 12:
+            self.count = 0
+        else:
+            self.count = self.data.getInt(8)
+    
+    @args(String, [int])
+    def getName(self, index):
+    
+        return self.readString(self.data.getInt(12 + (index * 4)) + 8)
+    
+    @args(String, [int])
+    def getSpec(self, index):
+    
+        offset = self.data.getInt(12 + (index * 4)) + 8
+        return self.readString(offset + 2 + (self.data.getShort(offset) & 0xffff))
+    
+    @args(float, [int])
+    def getLatitude(self, index):
+    
+        return self.data.getFloat(self.data.getInt(12 + (index * 4)))
+    
+    @args(float, [int])
+    def getLongitude(self, index):
+    
+        return self.data.getFloat(self.data.getInt(12 + (index * 4)) + 4)
+    
+    @args(String, [int])
+    def readString(self, offset):
+    
+        # Use a duplicate of the buffer so that the table can be read from
+        # more than one thread.
+        length = self.data.getShort(offset) & 0xffff
+        buf = self.data.duplicate()
+        buf.position(offset + 2)
+        
+        b = array(byte, length)
+        buf.get(b)
+        return String(b, "UTF-8")
+    
+    @args(int, [String])
+    def find(self, name):
+    
+        # Return the index of the place with the given name, or -1 if there
+        # is no such place.
+        key = name.getBytes("UTF-8")
+        low = 0
+        high = self.count
+        
+        while low < high:
+        
+            middle = (low + high) / 2
+            c = self.compareName(middle, key)
+            
+            if c == 0:
+                return middle
+            elif c < 0:
+                low = middle + 1
+            else:
+                high = middle
+        
+        return -1
+    
+    @args(int, [int, [byte]])
+    def compareName(self, index, key):
+    
+        offset = self.data.getInt(12 + (index * 4)) + 8
+        length = self.data.getShort(offset) & 0xffff
+        
+        i = 0
+        while i < length and i < len(key):
+        
+            a = self.data.get(offset + 2 + i) & 0xff
+            b = key[i] & 0xff
+            if a != b:
+                return a - b
+            
+            i += 1
+        
+        return length - len(key)
+
+
+class SpatialIndex(Object):
+
+    # A k-d tree containing the positions of the places on a unit sphere,
+    # created by the build script. See placedata.py for the format. Places
+    # are referred to by their positions in the place table.
+    
+    __fields__ = {"data": ByteBuffer, "count": int}
+    
+    @args(void, [ByteBuffer])
+    def __init__(self, data):
+    
+        Object.__init__(self)
+        
+        self.data = data
+        
+        if self.data.capacity() < 12:
+            self.count = 0
+        else:
+            self.count = self.data.getInt(8)
+    
+    @args([int], [double, double, int])
+    def nearest(self, latitude, longitude, n):
+    
+        # Return the numbers of the n places nearest to the given position,
+        # nearest first.
+        lat = Math.toRadians(latitude)
+        lon = Math.toRadians(longitude)
+        
+        query = NearestPlaces(Math.cos(lat) * Math.cos(lon),
+                              Math.cos(lat) * Math.sin(lon), Math.sin(lat),
+                              Math.min(n, self.count))
+        
+        if query.size() > 0:
+            self.search(0, self.count, 0, query)
+        
+        return query.places
+    
+    @args(void, [int, int, int, NearestPlaces])
+    def search(self, start, end, axis, query):
+    
+        if start == end:
+            return
+        
+        middle = (start + end) / 2
+        offset = 12 + (middle * 16)
+        
+        dx = query.x - self.data.getFloat(offset)
+        dy = query.y - self.data.getFloat(offset + 4)
+        dz = query.z - self.data.getFloat(offset + 8)
+        
+        query.add(self.data.getInt(offset + 12), (dx * dx) + (dy * dy) + (dz * dz))
+        
+        if axis == 0:
+            d = dx
+        elif axis == 1:
+            d = dy
+        else:
+            d = dz
+        
+        next = (axis + 1) % 3
+        
+        # Search the side of the dividing plane containing the position
+        # first, then the other side if it could contain nearer places.
+        if d < 0:
+            self.search(start, middle, next, query)
+            if d * d < query.worst():
+                self.search(middle + 1, end, next, query)
+        else:
+            self.search(middle + 1, end, next, query)
+            if d * d < query.worst():
+                self.search(start, middle, next, query)
+
+
+class NearestPlaces(Object):
+
+    # The nearest places found so far, in order of their squared distances
+    # from the position.
+    
+    __fields__ = {"x": double, "y": double, "z": double,
+                  "places": [int], "distances": [double], "found": int}
+    
+    @args(void, [double, double, double, int])
+    def __init__(self, x, y, z, n):
+    
+        Object.__init__(self)
+        
+        self.x = x
+        self.y = y
+        self.z = z
+        self.places = array(int, n)
+        self.distances = array(double, n)
+        self.found = 0
+    
+    @args(int, [])
+    def size(self):
+    
+        return len(self.places)
+    
+    @args(double, [])
+    def worst(self):
+    
+        if self.found < len(self.places):
+            return Double.POSITIVE_INFINITY
+        
+        return self.distances[self.found - 1]
+    
+    @args(void, [int, double])
+    def add(self, place, distance):
+    
+        if distance >= self.worst():
+            return
+        
+        if self.found < len(self.places):
+            self.found += 1
+        
+        # Move the more distant places along to make room.
+        i = self.found - 1
+        while i > 0 and self.distances[i - 1] > distance:
+            self.places[i] = self.places[i - 1]
+            self.distances[i] = self.distances[i - 1]
+            i -= 1
+        
+        self.places[i] = place
+        self.distances[i] = distance
+
+
+class PlaceIndex(Object):
+
+    # An index of the words in the names of places and the areas they are
+    # in, created by the build script. See placedata.py for the format.
+    # Places are referred to in the index by their ranks and are returned
+    # as their positions in the place table.
+    
+    __fields__ = {"data": ByteBuffer, "places": int, "count": int,
+                  "tokenTable": int,
+                  "letters": String, "replacements": [String],
+                  "matched": [int], "names": [int]}
+    
+    @args(void, [ByteBuffer])
+    def __init__(self, data):
+    
+        Object.__init__(self)
+        
+        # Letters that are not decomposed into a base letter and an accent by
+        # Unicode normalisation, and their replacements. This must match the
+        # table in placedata.py.
+        self.letters = u"æøœßđðłþı"
+        self.replacements = array(["ae", "o", "oe", "ss", "d", "d", "l", "th",
+                                   "i"])
+        
+        self.data = data
+        
+        if self.data.capacity() < 16:
+            self.places = 0
+            self.count = 0
+        else:
+            self.places = self.data.getInt(8)
+            self.count = self.data.getInt(12)
+        
+        # The offsets of the tokens follow the table of ranked places.
+        self.tokenTable = 16 + (self.places * 4)
+        
+        # The arrays used to record the places matched by each search. These
+        # are only used by one search at a time because the filter that uses
+        # the index performs its searches in a single worker thread.
+        self.matched = array(int, self.places)
+        self.names = array(int, self.places)
+    
+    @args([String], [String])
+    def tokens(self, text):
+    
+        # Convert the text to lower case, remove any accents and replace the
+        # letters above, splitting it into words.
+        text = Normalizer.normalize(text.toLowerCase(), Normalizer.Form.NFD)
+        b = StringBuilder()
+        
+        i = 0
+        while i < len(text):
+        
+            c = text.charAt(i)
+            i += 1
+            t = Character.getType(c)
+            
+            if t == Character.NON_SPACING_MARK or \
+               t == Character.COMBINING_SPACING_MARK or \
+               t == Character.ENCLOSING_MARK:
+                continue
+            
+            elif not Character.isLetterOrDigit(c):
+                b.append(" ")
+                continue
+            
+            j = self.letters.indexOf(int(c))
+            if j == -1:
+                b.append(c)
+            else:
+                b.append(self.replacements[j])
+        
+        text = b.toString().trim()
+        if len(text) == 0:
+            return array(String, 0)
+        
+        return text.split(" +")
+    
+    @args([int], [String, int])
+    def search(self, text, limit):
+    
+        # Return the numbers of up to limit places with names or areas that
+        # contain words starting with each of the words in the text. Places
+        # with names that match are returned first, then the others, each in
+        # order of their rank.
+        words = self.tokens(text)
+        if len(words) == 0 or self.count == 0:
+            return array(int, 0)
+        
+        # Count the words that each place has matched so far and record the
+        # places with names that match, keeping the range of ranks of the
+        # places that matched all the words. Only places that match the
+        # first word are changed, so remember the tokens for that word.
+        matched = self.matched
+        names = self.names
+        first = self.places
+        last = -1
+        firstStart = 0
+        firstEnd = 0
+        
+        i = 0
+        while i < len(words):
+        
+            prefix = words[i].getBytes("UTF-8")
+            start = self.findPrefix(prefix, False)
+            end = self.findPrefix(prefix, True)
+            
+            if i == 0:
+                firstStart = start
+                firstEnd = end
+            
+            j = start
+            while j < end:
+            
+                rank = self.getRank(j)
+                
+                if matched[rank] == i:
+                    matched[rank] = i + 1
+                    if i == len(words) - 1:
+                        first = Math.min(first, rank)
+                        last = Math.max(last, rank)
+                
+                if matched[rank] == i + 1 and self.getField(j) == 0:
+                    names[rank] = 1
+                
+                j += 1
+            
+            i += 1
+        
+        # Collect the places in order of rank, first those with names that
+        # matched, then the others, stopping when enough have been found.
+        results = array(int, limit)
+        n = 0
+        name = 1
+        
+        while name >= 0 and n < limit:
+        
+            rank = first
+            while rank <= last and n < limit:
+            
+                if matched[rank] == len(words) and names[rank] == name:
+                    results[n] = self.data.getInt(16 + (rank * 4))
+                    n += 1
+                
+                rank += 1
+            
+            name -= 1
+        
+        # Clear the entries for the places that were changed, ready for the
+        # next search.
+        j = firstStart
+        while j < firstEnd:
+            rank = self.getRank(j)
+            matched[rank] = 0
+            names[rank] = 0
+            j += 1
+        
+        if n < limit:
+            return Arrays.copyOf(results, n)
+        
+        return results
+    
+    @args(int, [[byte], bool])
+    def findPrefix(self, prefix, after):
+    
+        # Return the first token that starts with the prefix, or is greater
+        # than it, using a binary search. If after is True then return the
+        # first token after those starting with the prefix.
+        low = 0
+        high = self.count
+        
+        while low < high:
+        
+            middle = (low + high) / 2
+            c = self.comparePrefix(middle, prefix)
+            
+            if c < 0 or (after and c == 0):
+                low = middle + 1
+            else:
+                high = middle
+        
+        return low
+    
+    @args(int, [int, [byte]])
+    def comparePrefix(self, index, prefix):
+    
+        # Compare the start of the token with the prefix, returning zero if
+        # the token starts with it.
+        offset = self.data.getInt(self.tokenTable + (index * 4))
+        length = self.data.get(offset) & 0xff
+        
+        i = 0
+        while i < len(prefix):
+        
+            if i == length:
+                return -1
+            
+            a = self.data.get(offset + 1 + i) & 0xff
+            b = prefix[i] & 0xff
+            if a != b:
+                return a - b
+            
+            i += 1
+        
+        return 0
+    
+    @args(int, [int])
+    def getField(self, index):
+    
+        offset = self.data.getInt(self.tokenTable + (index * 4))
+        return self.data.get(offset + 1 + (self.data.get(offset) & 0xff))
+    
+    @args(int, [int])
+    def getRank(self, index):
+    
+        offset = self.data.getInt(self.tokenTable + (index * 4))
+        return self.data.getInt(offset + 2 + (self.data.get(offset) & 0xff))
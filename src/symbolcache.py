@@ -0,0 +1,72 @@
+"""
+symbolcache.py - A cache of weather symbol images for the Weather Forecast
+                 application.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from java.lang import Integer
+from android.content.res import Resources
+from android.graphics import Bitmap, BitmapFactory
+from android.util import LruCache
+
+from forecastparser import ForecastDocument
+
+class SymbolCache(LruCache):
+
+    # Keeps the decoded images for the symbols most recently shown, indexed
+    # by resource ID, discarding the least recently used ones when their
+    # total size exceeds the limit, given in bytes. Images that are not in
+    # the cache are decoded when they are requested. LruCache is
+    # thread-safe, so worker threads can decode the symbols used in a
+    # document before its forecasts are shown.
+    
+    #                 K        V
+    __item_types__ = [Integer, Bitmap]
+    
+    @args(void, [Resources, int])
+    def __init__(self, resources, maxSize):
+    
+        LruCache.__init__(self, maxSize)
+        self.resources = resources
+    
+    @args(V, [K])
+    def create(self, key):
+    
+        return BitmapFactory.decodeResource(self.resources, key.intValue())
+    
+    @args(int, [K, V])
+    def sizeOf(self, key, value):
+    
+        return value.getByteCount()
+    
+    @args(Bitmap, [int])
+    def getSymbol(self, id):
+    
+        return self.get(Integer.valueOf(id))
+    
+    @args(void, [int])
+    def load(self, id):
+    
+        if id != -1:
+            self.get(Integer.valueOf(id))
+    
+    @args(void, [ForecastDocument])
+    def loadSymbols(self, document):
+    
+        for forecast in document.forecasts:
+            self.load(forecast.symbol)
+
@@ -0,0 +1,119 @@
+"""
+timings.py - Performance measurements for the Weather Forecast application.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from java.lang import Object, String, StringBuilder
+from java.util import Arrays, List, Map
+from android.util import Log
+
+class Timings(Object):
+
+    # Records the time taken by each phase of showing a forecast, in
+    # nanoseconds, keeping the most recent times for each phase so that
+    # they can be summarised in the log. Phases are reported in the order
+    # in which they were first recorded. This is only used from the UI
+    # thread.
+    
+    __fields__ = {"phases": Map(String, Histogram), "names": List(String),
+                  "size": int}
+    
+    @args(void, [int])
+    def __init__(self, size):
+    
+        Object.__init__(self)
+        
+        self.size = size
+        self.phases = {}
+        self.names = []
+    
+    @args(void, [String, long])
+    def add(self, name, time):
+    
+        # Negative times are used for phases that did not take place.
+        if time < 0:
+            return
+        
+        try:
+            histogram = self.phases[name]
+        except KeyError:
+            histogram = Histogram(self.size)
+            self.phases[name] = histogram
+            self.names.add(name)
+        
+        histogram.add(time)
+    
+    def dump(self):
+    
+        for name in self.names:
+            Log.i("WeatherForecast", name + ": " + self.phases[name].summary())
+
+
+class Histogram(Object):
+
+    # Keeps the most recent values in a ring buffer, together with the total
+    # number of values that have been added.
+    
+    __fields__ = {"values": [long], "count": int, "next": int, "total": long}
+    
+    @args(void, [int])
+    def __init__(self, size):
+    
+        Object.__init__(self)
+        
+        self.values = array(long, size)
+        self.count = 0
+        self.next = 0
+        self.total = 0
+    
+    @args(void, [long])
+    def add(self, value):
+    
+        self.values[self.next] = value
+        self.next = (self.next + 1) % len(self.values)
+        
+        if self.count < len(self.values):
+            self.count += 1
+        
+        self.total += 1
+    
+    @args(String, [])
+    def summary(self):
+    
+        # Describe the median, 90th percentile and maximum of the values,
+        # converting them to milliseconds.
+        values = Arrays.copyOf(self.values, self.count)
+        Arrays.sort(values)
+        
+        b = StringBuilder()
+        b.append(self.total)
+        b.append(" times, median ")
+        self.formatTime(b, values[(self.count - 1) / 2])
+        b.append(", 90% ")
+        self.formatTime(b, values[((self.count * 9) + 9) / 10 - 1])
+        b.append(", max ")
+        self.formatTime(b, values[self.count - 1])
+        return b.toString()
+    
+    @args(void, [StringBuilder, long])
+    def formatTime(self, b, time):
+    
+        tenths = time / 100000
+        b.append(tenths / 10)
+        b.append(".")
+        b.append(tenths % 10)
+        b.append(" ms")
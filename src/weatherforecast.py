@@ -17,18 +17,26 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-from java.io import BufferedInputStream, FileNotFoundException, InputStream
-from java.lang import Object, String, System
-from java.net import HttpURLConnection, URL
-from java.util import List, Map
-from android.os import AsyncTask
+from java.io import InputStream
+from java.lang import Math, Object, Runnable, String, System
+from java.util import Collections, List, Map
+from java.util.concurrent import Executors
+from android.app import ActivityManager
+from android.content import Context
+from android.os import AsyncTask, Handler, Trace
+from android.util import Log
 from android.widget import Toast
 from serpentine.activities import Activity
 
 from app_resources import R
 
 from exceptions import WeatherException
-from forecastparser import Forecast, ForecastParser
+from forecastcache import CacheEntry, ForecastCache
+from forecastclient import ForecastClient, ForecastResponse
+from forecastparser import Forecast, ForecastDocument, ForecastListener, \
+                           ForecastParser, SymbolTable
+from symbolcache import SymbolCache
+from timings import Timings
 from widgets import ForecastWidget, LocationListener, LocationWidget
 
 class WeatherForecastActivity(Activity):
@@ -42,76 +50,263 @@ class WeatherForecastActivity(Activity):
         Activity.__init__(self)
         self.state = "entry"
         self.cache = {}
+        self.requestStarted = 0
     
     def onCreate(self, bundle):
     
         Activity.onCreate(self, bundle)
         
+        # Keep decoded symbol images in up to a thirty-second of the memory
+        # available to the application, which is enough for all of them on
+        # most devices.
+        manager = CAST(self.getSystemService(Context.ACTIVITY_SERVICE),
+                       ActivityManager)
+        self.symbols = SymbolCache(self.getResources(),
+                                   manager.getMemoryClass() * 32768)
+        
         self.entryWidget = LocationWidget(self, self)
-        self.forecastWidget = ForecastWidget(self)
+        self.forecastWidget = ForecastWidget(self, self.symbols)
         self.setContentView(self.entryWidget)
-        self.parser = ForecastParser(self.getResources())
+        
+        # Keep up to 2 MB of forecast documents in the application's cache
+        # directory so that they are available when the application restarts.
+        # Each document is checked again after its next update time, but no
+        # sooner than 5 minutes and no later than 6 hours after it was
+        # obtained.
+        self.diskCache = ForecastCache(self, 2097152, 300000, 21600000)
+        
+        # Fetch up to three documents at a time, leaving one worker free for
+        # the location the user asks for while the others are refreshed.
+        self.scheduler = FetchScheduler(self, self.diskCache, 3)
+        
+        # Check the saved locations every 15 minutes while the application
+        # is visible, fetching up to two stale documents at a time.
+        self.refresher = Refresher(self, self.diskCache, 2, 900000)
+        
+        # Keep the last 100 times taken by each phase of showing forecasts,
+        # writing a summary of them to the log when the activity is paused.
+        self.timings = Timings(100)
+    
+    def onResume(self):
+    
+        Activity.onResume(self)
+        self.refresher.start()
     
     def onPause(self):
     
         Activity.onPause(self)
+        self.refresher.stop()
         self.entryWidget.writeLocations()
+        self.diskCache.writeIndex()
+        self.timings.dump()
+    
+    def onDestroy(self):
+    
+        Activity.onDestroy(self)
+        self.scheduler.shutdown()
     
     def locationEntered(self, location):
     
+        # Places given by position are stored and fetched using a key for
+        # the point on the forecast grid nearest to them.
+        name = self.scheduler.client.getName(location)
+        location = self.scheduler.client.getKey(location)
+        
+        # Give up waiting for any other location.
         if self.state == "fetching":
-            return
+            if location == self.place:
+                return
+            self.cancelFetch()
         
         self.current_time = System.currentTimeMillis()
+        self.requestStarted = System.nanoTime()
         self.place = location
         
-        try:
-            item = self.cache[location]
-            if self.current_time - item.time < 600000: # 10 minutes
-                self.showForecasts(item.forecasts)
-                return
+        # Documents for places given by position may be shared with other
+        # places, so show the name that the place was saved with instead of
+        # the one in the document.
+        self.forecastWidget.setPlaceName(name)
         
-        except KeyError:
-            pass
+        # Use the stored document until the time the server said it would
+        # next be updated, otherwise ask the server if it has a newer one.
+        entry = self.diskCache.getEntry(location)
+        
+        if entry != None and self.diskCache.isFresh(entry, self.current_time):
+            self.readForecasts(entry)
         
+        elif self.cache.containsKey(location):
+            self.startTask(entry, "revalidate")
+        else:
+            self.startTask(entry, "fetch")
+        
+        #self.startTask(None, "sample")
+    
+    @args(void, [CacheEntry, str])
+    def startTask(self, entry, mode):
+    
         self.state = "fetching"
         
-        self.task = Task(self)
-        self.task.execute(array([location]))
-        #self.parseForecasts(self.getSampleStream())
+        # If the document is already being fetched, perhaps by the
+        # background refresh, then the result of that task is used.
+        self.scheduler.request(self.place, entry, mode)
     
-    @args(void, [InputStream])
-    def parseForecasts(self, stream):
+    def cancelFetch(self):
     
-        if stream == None:
-            self.showError()
+        # The first forecasts may already be shown while the rest of the
+        # document is read, so return to the entry widget as well.
+        self.state = "entry"
+        self.setContentView(self.entryWidget)
+        self.scheduler.cancel(self.place)
+    
+    @args(void, [CacheEntry])
+    def readForecasts(self, entry):
+    
+        self.diskCache.touch(self.place)
+        
+        # Reuse the forecasts that were read from the stored document if they
+        # are still in memory, otherwise read them in the background.
+        try:
+            item = self.cache[self.place]
+        except KeyError:
+            self.startTask(entry, "stored")
+            return
+        
+        item.time = entry.time
+        self.showForecasts(item.document)
+        self.forecastsShown(True)
+    
+    @args(void, [Task, [Forecast]])
+    def forecastsParsed(self, task, forecasts):
+    
+        if self.state != "fetching" or task.location != self.place:
+            return
+        
+        started = System.nanoTime()
+        Trace.beginSection("bind")
+        
+        # Show the first forecasts while the rest of the document is read.
+        if task.shown == 0:
+            self.forecastWidget.clearForecasts(task.document)
+            self.setContentView(self.forecastWidget)
+        
+        self.forecastWidget.appendForecasts(forecasts)
+        
+        Trace.endSection()
+        self.timings.add("bind", System.nanoTime() - started)
+        
+        if task.shown == 0:
+            Log.d("WeatherForecast", "First row shown after " + \
+                  str((System.nanoTime() - task.parseStarted)/1000000) + " ms")
+            self.forecastsShown(task.outcome != "downloaded")
+        
+        task.shown += len(forecasts)
+    
+    @args(void, [Task, ForecastResult])
+    def fetchFinished(self, task, result):
+    
+        # Store the results of every task, including those for locations
+        # that are not being shown.
+        location = task.location
+        self.recordTimings(task)
+        
+        if result.outcome == "failed":
+            self.diskCache.discard(location)
+        
+        elif result.outcome == "downloaded":
+            self.diskCache.commit(location, result.etag, result.lastModified,
+                                  result.document.lastUpdate,
+                                  result.document.nextUpdate, task.time)
+        
+        elif result.outcome == "not modified":
+            self.diskCache.validated(location, task.time)
+        
+        entry = self.diskCache.getEntry(location)
+        
+        if result.document != None:
+            if entry == None:
+                self.cache[location] = CacheItem(task.time, result.document)
+            else:
+                self.cache[location] = CacheItem(entry.time, result.document)
+        
+        self.refresher.fetchFinished(location, result.outcome)
+        
+        if self.state != "fetching" or location != self.place:
+            return
+        
+        if result.outcome == "failed" and entry == None:
             self.state = "entry"
+            self.setContentView(self.entryWidget)
+            self.showError(result.error)
             return
         
-        forecasts = self.parser.parse(stream)
-        stream.close()
+        # Report any problem with the connection, even if the stored
+        # forecasts can be shown instead.
+        if result.error != "":
+            self.showError(result.error)
         
-        self.showForecasts(forecasts)
+        # If the stored document was not read then the forecasts obtained
+        # from it are still in memory, or can be read from it now.
+        if result.document == None:
+            self.readForecasts(entry)
+            return
+        
+        if task.shown == 0:
+            self.showForecasts(result.document)
+            self.forecastsShown(result.outcome != "downloaded")
+        else:
+            self.state = "forecast"
+        
+        Log.d("WeatherForecast", "Forecasts read in " + \
+              str((System.nanoTime() - task.parseStarted)/1000000) + " ms")
     
-    @args(void, [List(Forecast)])
-    def showForecasts(self, forecasts):
+    @args(void, [Task])
+    def recordTimings(self, task):
     
-        self.cache[self.place] = CacheItem(self.current_time, forecasts)
+        # Phases that did not take place for the task are ignored.
+        self.timings.add("connect", task.connectTime)
+        self.timings.add("first byte", task.firstByteTime)
+        self.timings.add("download", task.downloadTime)
+        self.timings.add("parse", task.parseTime)
+    
+    @args(void, [bool])
+    def forecastsShown(self, cached):
+    
+        # Record the time taken to show the first forecasts for the location
+        # that was entered, depending on whether a stored document was used.
+        if self.requestStarted == 0:
+            return
+        
+        time = System.nanoTime() - self.requestStarted
+        self.requestStarted = 0
+        
+        if cached:
+            self.timings.add("shown (cache hit)", time)
+        else:
+            self.timings.add("shown (cache miss)", time)
+    
+    @args(void, [ForecastDocument])
+    def showForecasts(self, document):
+    
+        started = System.nanoTime()
+        Trace.beginSection("bind")
         
         try:
-            self.forecastWidget.addForecasts(forecasts)
+            self.forecastWidget.addForecasts(document)
             
             self.state = "forecast"
             self.setContentView(self.forecastWidget)
         
         except:
             self.state = "entry"
-            self.showError()
+            self.showError("Failed to read weather forecast")
+        
+        Trace.endSection()
+        self.timings.add("bind", System.nanoTime() - started)
     
-    def showError(self):
+    @args(void, [String])
+    def showError(self, message):
     
-        Toast.makeText(self, "Failed to read weather forecast,",
-                       Toast.LENGTH_SHORT).show()
+        Toast.makeText(self, message, Toast.LENGTH_SHORT).show()
     
     @args(InputStream, [])
     def getSampleStream(self):
@@ -126,6 +321,10 @@ class WeatherForecastActivity(Activity):
             self.state = "entry"
             self.setContentView(self.entryWidget)
         
+        elif self.state == "fetching":
+            # Stop waiting for the forecast.
+            self.cancelFetch()
+        
         elif self.state == "entry":
             # If already showing the entry widget then exit.
             Activity.onBackPressed(self)
@@ -133,58 +332,499 @@ class WeatherForecastActivity(Activity):
 
 class Task(AsyncTask):
 
-    #               Params Progress Result
-    __item_types__ = [str, int, InputStream]
+    __interfaces__ = [ForecastListener]
     
-    @args(void, [WeatherForecastActivity])
-    def __init__(self, activity):
+    #               Params Progress  Result
+    __item_types__ = [str, Forecast, ForecastResult]
+    
+    __fields__ = {"pending": List(Forecast), "parseStarted": long,
+                  "document": ForecastDocument, "location": String,
+                  "time": long, "received": long, "outcome": str,
+                  "connectTime": long, "firstByteTime": long,
+                  "downloadTime": long, "parseTime": long}
+    
+    # The mode is one of the following:
+    #   "fetch"       fetch the document, or read the stored one
+    #   "revalidate"  fetch the document if it has changed, otherwise use the
+    #                 forecasts already in memory
+    #   "stored"      read the stored document
+    #   "sample"      read the sample document
+    #   "refresh"     fetch the document if it has changed, without reading
+    #                 the stored one or reporting progress
+    
+    @args(void, [FetchScheduler, String, CacheEntry, str])
+    def __init__(self, scheduler, location, entry, mode):
     
         AsyncTask.__init__(self)
-        self.activity = activity
+        self.scheduler = scheduler
+        self.cache = scheduler.cache
+        self.symbols = scheduler.activity.symbols
+        self.location = location
+        self.entry = entry
+        self.mode = mode
+        self.time = System.currentTimeMillis()
+        
+        self.etag = ""
+        self.lastModified = ""
+        self.received = 0
+        
+        self.document = None
+        self.pending = []
+        self.published = 0
+        self.shown = 0
+        self.parseStarted = System.nanoTime()
+        
+        # The outcome of fetching the document, and the times taken by each
+        # phase in nanoseconds, or -1 for phases that did not take place.
+        self.outcome = ""
+        self.connectTime = -1
+        self.firstByteTime = -1
+        self.downloadTime = -1
+        self.parseTime = -1
     
     @args(Result, [[Params]])
     def doInBackground(self, params):
     
-        # Unpack the location from the array.
-        location = params[0]
+        # Each worker thread borrows a parser for the duration of the task,
+        # returning it even if the task fails.
+        self.parser = self.scheduler.parsers.remove(0)
+        try:
+            return self.fetch(params[0])
+        finally:
+            self.scheduler.parsers.add(self.parser)
+    
+    @args(ForecastResult, [str])
+    def fetch(self, location):
+    
+        outcome = "stored"
+        error = ""
+        
+        refresh = self.mode == "revalidate" or self.mode == "refresh"
+        
+        if self.mode == "fetch" or refresh:
+            try:
+                outcome = self.fetchData(location)
+            except WeatherException, e:
+                # Fall back to the stored document if the server could not
+                # be reached.
+                if self.entry == None or self.mode == "refresh":
+                    return self.failed(e.getMessage())
+                
+                error = e.getMessage()
+        
+        if outcome != "downloaded" and refresh:
+            return ForecastResult(outcome, None, "", "", error)
+        
+        if self.isCancelled():
+            return self.failed("Cancelled")
+        
+        if outcome == "downloaded":
+            stream = self.cache.openTempStream(location)
+        elif self.mode == "sample":
+            stream = self.scheduler.activity.getSampleStream()
+        else:
+            stream = self.cache.openStream(location)
+        
+        if stream == None:
+            return self.failed("Failed to read weather forecast")
+        
+        # Parse the document here instead of in the UI thread, passing the
+        # forecasts to it in batches as they are read.
+        self.outcome = outcome
+        self.parseStarted = System.nanoTime()
+        
+        if self.mode == "refresh":
+            listener = None
+        else:
+            listener = self
+        
+        Trace.beginSection("parse")
         
         try:
-            forecasts = self.fetchData(location)
-        except WeatherException, e:
-            Toast.makeText(self.activity, e.getMessage(), Toast.LENGTH_SHORT).show()
-            return []
+            document = self.parser.parse(stream, listener)
+            stream.close()
+        except:
+            Trace.endSection()
+            return self.failed("Failed to read weather forecast")
+        
+        Trace.endSection()
+        self.parseTime = System.nanoTime() - self.parseStarted
+        
+        # Decode the symbols for the forecasts here, in case they were not
+        # published as they were read.
+        self.symbols.loadSymbols(document)
         
-        return forecasts
+        self.publishPending()
+        
+        return ForecastResult(outcome, document, self.etag, self.lastModified,
+                              error)
+    
+    @args(ForecastResult, [String])
+    def failed(self, error):
+    
+        return ForecastResult("failed", None, "", "", error)
     
-    @args(InputStream, [str])
+    @args(void, [ForecastDocument, Forecast])
+    def forecastParsed(self, document, forecast):
+    
+        # Keep the document so that its place and credit can be shown with
+        # the first forecasts, and decode the symbol for the forecast before
+        # it is shown.
+        self.document = document
+        self.symbols.load(forecast.symbol)
+        self.pending.add(forecast)
+        
+        # Publish the first forecast as soon as possible so that it can be
+        # shown, then publish the rest in batches.
+        if self.published == 0 or len(self.pending) == 8:
+            self.publishPending()
+    
+    def publishPending(self):
+    
+        if len(self.pending) == 0:
+            return
+        
+        batch = array(Forecast, len(self.pending))
+        i = 0
+        for forecast in self.pending:
+            batch[i] = forecast
+            i += 1
+        
+        self.published += len(self.pending)
+        self.pending.clear()
+        self.publishProgress(batch)
+    
+    @args(str, [str])
     def fetchData(self, place):
     
-        url = URL("https://www.yr.no/place/" + place + "/forecast.xml")
-        connection = CAST(url.openConnection(), HttpURLConnection)
-        connection.setInstanceFollowRedirects(True)
+        url = self.scheduler.client.getURL(place)
+        
+        if self.entry != None:
+            etag = self.entry.etag
+            lastModified = self.entry.lastModified
+        else:
+            etag = ""
+            lastModified = ""
+        
+        response = self.open(url, etag, lastModified)
+        
+        # The stored document may have been evicted from the cache since the
+        # task was started, so fetch it again without the conditions if the
+        # server says that it has not changed.
+        if response.stream == None and not self.cache.getFile(place).exists():
+            response = self.open(url, "", "")
+        
+        self.connectTime = response.connectTime
+        self.firstByteTime = response.firstByteTime
         
+        if response.stream == None:
+            return "not modified"
+        
+        self.etag = response.etag
+        self.lastModified = response.lastModified
+        
+        # Write the document to the cache so that it can be read by the
+        # parser and kept if it is valid.
+        started = System.nanoTime()
+        Trace.beginSection("download")
+        downloaded = self.cache.download(place, response.stream)
+        Trace.endSection()
+        self.downloadTime = System.nanoTime() - started
+        
+        if not downloaded:
+            raise WeatherException("No connection")
+        
+        self.received = response.received()
+        Log.d("WeatherForecast", place + ": " + str(self.received) + \
+              " bytes received")
+        
+        return "downloaded"
+    
+    @args(ForecastResponse, [String, String, String])
+    def open(self, url, etag, lastModified):
+    
         try:
-            stream = BufferedInputStream(connection.getInputStream())
+            return self.scheduler.client.open(url, etag, lastModified)
         except:
-            return None
-        
-        return stream
+            raise WeatherException("No connection")
+    
+    @args(void, [[Progress]])
+    def onProgressUpdate(self, values):
+    
+        self.scheduler.activity.forecastsParsed(self, values)
+    
+    @args(void, [Result])
+    def onPostExecute(self, result):
+    
+        self.scheduler.taskFinished(self, result)
     
     @args(void, [Result])
-    def onPostExecute(self, stream):
+    def onCancelled(self, result):
+    
+        self.scheduler.taskCancelled(self)
+
+
+class FetchScheduler(Object):
+
+    # Runs tasks on a fixed number of worker threads, with at most one task
+    # for each location. Requests for a location that is already being
+    # fetched share the task that is running, and the results of all tasks
+    # are passed to the activity in the UI thread.
+    
+    __fields__ = {"tasks": Map(String, Task), "restarts": Map(String, String),
+                  "parsers": List(ForecastParser)}
+    
+    @args(void, [WeatherForecastActivity, ForecastCache, int])
+    def __init__(self, activity, cache, threads):
+    
+        Object.__init__(self)
+        
+        self.activity = activity
+        self.cache = cache
+        self.executor = Executors.newFixedThreadPool(threads)
+        
+        # Give up if the server cannot be reached within 15 seconds or stops
+        # sending data for 30 seconds. Places given by position share
+        # documents if they are within the same 0.025 degree grid cell,
+        # roughly the spacing of the forecast model's grid.
+        self.client = ForecastClient(15000, 30000, 25)
+        self.tasks = {}
+        self.restarts = {}
+        
+        # Parsers are not thread-safe, so create one for each worker. The
+        # list is shared between the workers. The symbol table is only read,
+        # so the parsers share it.
+        symbols = SymbolTable(activity.getResources())
+        parsers = []
+        i = 0
+        while i < threads:
+            parsers.add(ForecastParser(symbols))
+            i += 1
+        
+        self.parsers = Collections.synchronizedList(parsers)
+    
+    @args(void, [String, CacheEntry, str])
+    def request(self, location, entry, mode):
+    
+        try:
+            task = self.tasks[location]
+            
+            # A cancelled task may still be writing the document, so start
+            # another one when it has finished.
+            if task.isCancelled():
+                self.restarts[location] = mode
+            
+            return
+        
+        except KeyError:
+            pass
+        
+        task = Task(self, location, entry, mode)
+        self.tasks[location] = task
+        task.executeOnExecutor(self.executor, array([location]))
+    
+    @args(bool, [String])
+    def isFetching(self, location):
+    
+        return self.tasks.containsKey(location)
+    
+    @args(void, [String])
+    def cancel(self, location):
+    
+        self.restarts.remove(location)
+        
+        try:
+            task = self.tasks[location]
+        except KeyError:
+            return
+        
+        # Let background refreshes finish so that their results are kept.
+        if task.mode != "refresh":
+            task.cancel(True)
+    
+    @args(void, [Task, ForecastResult])
+    def taskFinished(self, task, result):
+    
+        self.tasks.remove(task.location)
+        self.activity.fetchFinished(task, result)
+    
+    @args(void, [Task])
+    def taskCancelled(self, task):
+    
+        location = task.location
+        self.tasks.remove(location)
+        self.cache.discard(location)
+        
+        mode = self.restarts.remove(location)
+        if mode != None:
+            self.request(location, self.cache.getEntry(location), mode)
+        
+        self.activity.refresher.fetchFinished(location, "cancelled")
     
-        self.activity.parseForecasts(stream)
+    def shutdown(self):
+    
+        for task in self.tasks.values():
+            task.cancel(True)
+        
+        self.executor.shutdown()
+
+
+class Refresher(Object):
+
+    # Periodically fetches the documents for the saved locations that have
+    # expired so that they can be shown without waiting for the network.
+    # Only a limited number of documents are refreshed at a time, and
+    # locations that could not be fetched are retried after a delay that
+    # doubles with each failure, up to an hour.
+    
+    __interfaces__ = [Runnable]
+    
+    __fields__ = {"queue": List(String), "running": List(String),
+                  "states": Map(String, RefreshState),
+                  "maxTasks": int, "interval": long}
+    
+    @args(void, [WeatherForecastActivity, ForecastCache, int, long])
+    def __init__(self, activity, cache, maxTasks, interval):
+    
+        Object.__init__(self)
+        
+        self.activity = activity
+        self.cache = cache
+        self.maxTasks = maxTasks
+        self.interval = interval
+        self.handler = Handler()
+        
+        self.queue = []
+        self.running = []
+        self.states = {}
+    
+    def start(self):
+    
+        # Wait briefly so that the refresh does not compete with the
+        # application for the network as it starts.
+        self.handler.removeCallbacks(self)
+        self.handler.postDelayed(self, 5000)
+    
+    def stop(self):
+    
+        self.handler.removeCallbacks(self)
+        self.queue.clear()
+    
+    def run(self):
+    
+        self.refresh()
+        self.handler.postDelayed(self, self.interval)
+    
+    def refresh(self):
+    
+        time = System.currentTimeMillis()
+        widget = self.activity.entryWidget
+        self.queue.clear()
+        
+        for name in widget.order:
+            spec = self.activity.scheduler.client.getKey(widget.locations[name])
+            
+            # Places that are near each other may share the same document.
+            if self.queue.contains(spec):
+                continue
+            elif self.activity.scheduler.isFetching(spec):
+                continue
+            
+            try:
+                if time < self.states[spec].retryTime:
+                    continue
+            except KeyError:
+                pass
+            
+            entry = self.cache.getEntry(spec)
+            if entry == None or not self.cache.isFresh(entry, time):
+                self.queue.add(spec)
+        
+        self.startTasks()
+    
+    def startTasks(self):
+    
+        while len(self.queue) > 0 and len(self.running) < self.maxTasks:
+        
+            spec = self.queue.remove(0)
+            if self.activity.scheduler.isFetching(spec):
+                continue
+            
+            self.running.add(spec)
+            self.activity.scheduler.request(spec, self.cache.getEntry(spec),
+                                            "refresh")
+    
+    @args(void, [String, String])
+    def fetchFinished(self, spec, outcome):
+    
+        # Called when any task for the location finishes or is cancelled.
+        self.running.remove(spec)
+        
+        if outcome == "failed":
+            try:
+                state = self.states[spec]
+            except KeyError:
+                state = RefreshState()
+                self.states[spec] = state
+            
+            # Wait for one minute after the first failure, doubling the
+            # delay each time up to an hour.
+            state.failures += 1
+            delay = Math.min(60000 << Math.min(state.failures - 1, 6), 3600000)
+            state.retryTime = System.currentTimeMillis() + delay
+        
+        elif outcome == "downloaded" or outcome == "not modified":
+            # Only forget earlier failures when the server was reached. Tasks
+            # that fall back to the stored document, or only read it, leave
+            # the delay unchanged.
+            self.states.remove(spec)
+        
+        self.startTasks()
+
+
+class RefreshState(Object):
+
+    __fields__ = {"failures": int, "retryTime": long}
+    
+    def __init__(self):
+    
+        Object.__init__(self)
+        
+        self.failures = 0
+        self.retryTime = 0
 
 
 class CacheItem(Object):
 
-    __fields__ = {"time": long, "forecasts": List(Forecast)}
+    __fields__ = {"time": long, "document": ForecastDocument}
     
-    @args(void, [long, List(Forecast)])
-    def __init__(self, time, forecasts):
+    @args(void, [long, ForecastDocument])
+    def __init__(self, time, document):
     
         Object.__init__(self)
         
         self.time = time
-        self.forecasts = forecasts
+        self.document = document
+
 
+class ForecastResult(Object):
+
+    # The result of a task, created in the background thread and only read
+    # in the UI thread. The outcome is one of "downloaded", "not modified",
+    # "stored" or "failed". The document is None if it was not read, either
+    # because it could not be obtained or because the forecasts from the
+    # stored document are already in memory.
+    
+    __fields__ = {"outcome": String, "document": ForecastDocument,
+                  "etag": String, "lastModified": String, "error": String}
+    
+    @args(void, [String, ForecastDocument, String, String, String])
+    def __init__(self, outcome, document, etag, lastModified, error):
+    
+        Object.__init__(self)
+        
+        self.outcome = outcome
+        self.document = document
+        self.etag = etag
+        self.lastModified = lastModified
+        self.error = error
@@ -19,25 +19,27 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from java.io import BufferedReader, File, FileNotFoundException, FileReader, \
                     FileWriter
-from java.lang import String
-from java.util import Calendar, List, Locale, Map
+from java.lang import CharSequence, Double, Float, Math, \
+                      NumberFormatException, Object, String
+from java.text import DateFormatSymbols
+from java.util import Calendar, List, Locale, Map, TimeZone
 from android.content import Context
 from android.graphics import Color, Typeface
-from android.os import Environment
-from android.view import Gravity, View, ViewGroup
-from android.widget import AdapterView, AutoCompleteTextView, Button, \
-    EditText, ImageView, LinearLayout, ListView, RelativeLayout, ScrollView, \
-    Space, TextView
+from android.os import AsyncTask, Environment
+from android.view import Gravity, LayoutInflater, View, ViewGroup
+from android.widget import AdapterView, AutoCompleteTextView, BaseAdapter, \
+    Button, EditText, Filter, Filterable, ImageView, LinearLayout, ListView, \
+    RelativeLayout, TextView
 
 import android.R
 
 from serpentine.files import Files
-from serpentine.adapters import FilterStringArrayAdapter, StringListAdapter
+from serpentine.adapters import StringListAdapter
 from serpentine.widgets import HBox
 
-from app_resources import R
-
-from forecastparser import Forecast
+from forecastparser import Forecast, ForecastDocument
+from places import PlaceData, PlaceIndex, PlaceTable, SpatialIndex
+from symbolcache import SymbolCache
 
 class LocationListener:
 
@@ -123,15 +125,30 @@ class LocationWidget(RelativeLayout):
                     if line == None:
                         break
                     
-                    spec = line.trim()
-                    pieces = spec.split("/")
+                    # Each line contains the name of a location and its
+                    # specification, separated by a tab. Older files only
+                    # contain specifications, so make a name from the last
+                    # part of each of these, without any place number.
+                    line = line.trim()
+                    tab = line.indexOf("\t")
                     
-                    if len(pieces) < 3:
-                        continue
+                    if tab != -1:
+                        name = line[:tab]
+                        spec = line[tab + 1:]
+                    else:
+                        spec = line
+                        pieces = spec.split("/")
+                        if len(pieces) < 3:
+                            continue
+                        
+                        name = pieces[len(pieces) - 1]
+                        if name.indexOf("~") != -1:
+                            name = name[:name.indexOf("~")]
+                        name = name.replace("_", " ")
                     
-                    place = pieces[len(pieces) - 1]
-                    self.locations[place] = spec
-                    self.order.add(place)
+                    name = self.uniqueName(name)
+                    self.locations[name] = spec
+                    self.order.add(name)
                 
                 stream.close()
             
@@ -147,7 +164,7 @@ class LocationWidget(RelativeLayout):
             stream = FileWriter(f)
             
             for key in self.order:
-                stream.write(self.locations[key] + "\n")
+                stream.write(key + "\t" + self.locations[key] + "\n")
             
             stream.flush()
             stream.close()
@@ -179,8 +196,12 @@ class LocationWidget(RelativeLayout):
     
     def addLocation(self, name, spec):
     
+        # Ignore places that are already in the list, but keep different
+        # places with the same name, such as positions, apart.
         if self.locations.containsKey(name):
-            return
+            if self.locations[name] == spec:
+                return
+            name = self.uniqueName(name)
         
         self.locations[name] = spec
         self.order.add(name)
@@ -188,6 +209,19 @@ class LocationWidget(RelativeLayout):
         self.adapter.items.add(name)
         self.listView.setAdapter(self.adapter)
     
+    @args(String, [String])
+    def uniqueName(self, name):
+    
+        # Return the name, or the name followed by a number if another
+        # location already has it.
+        unique = name
+        i = 2
+        while self.locations.containsKey(unique):
+            unique = name + " (" + str(i) + ")"
+            i += 1
+        
+        return unique
+    
     def onItemLongClick(self, parent, view, position, id):
     
         if self.mode == "normal":
@@ -259,36 +293,41 @@ class AddWidget(HBox):
 
     __interfaces__ = [View.OnClickListener]
     
+    __fields__ = {"places": PlaceTable, "locator": SpatialIndex}
+    
     @args(void, [Context, AddLocationListener])
     def __init__(self, context, handler):
     
         HBox.__init__(self, context)
         self.handler = handler
-        
-        # Read the lists of place names and place specifications from the
-        # application's resources, creating a dictionary from the two lists.
-        self.places = {}
-        resources = context.getResources()
-        place_names = resources.getStringArray(R.array.place_names)
-        
-        for name, place in zip(place_names,
-                               resources.getStringArray(R.array.places)):
-            self.places[name] = place
-        
-        # Use a specialised adapter to provide filtered lists of data for an
-        # auto-complete-enabled text view.
-        adapter = FilterStringArrayAdapter(context,
-            android.R.layout.simple_dropdown_item_1line, place_names)
+        self.places = None
+        self.locator = None
         
         self.locationEdit = AutoCompleteTextView(context)
-        self.locationEdit.setAdapter(adapter)
+        self.locationEdit.setHint("Place, or latitude, longitude")
         
         self.addButton = Button(context)
         self.addButton.setText("Add")
         self.addButton.setOnClickListener(self)
+        self.addButton.setEnabled(False)
         
         self.addWeightedView(self.locationEdit, 2)
         self.addWeightedView(self.addButton, 0)
+        
+        # The place files may need to be copied from the application's
+        # resources, so open them in the background.
+        PlaceLoader(self).execute(array([context]))
+    
+    @args(void, [PlaceData])
+    def placesLoaded(self, data):
+    
+        self.places = data.table
+        self.locator = data.locator
+        
+        # Use the place index created by the build script to provide lists
+        # of suggestions for an auto-complete-enabled text view.
+        self.locationEdit.setAdapter(PlaceAdapter(data.table, data.index))
+        self.addButton.setEnabled(True)
     
     def onClick(self, view):
     
@@ -296,16 +335,192 @@ class AddWidget(HBox):
         
         name = text.trim()
         
-        try:
-            spec = self.places[name]
-        except KeyError:
+        place = self.places.find(name)
+        if place != -1:
+            self.addPlace(place)
+        elif not self.addCoordinates(name):
             return
         
+        self.locationEdit.setText("")
+    
+    @args(bool, [String])
+    def addCoordinates(self, text):
+    
+        # Add the place nearest to a position entered as a latitude and
+        # longitude in degrees, separated by a comma, such as "59.91, 10.75".
+        # If the position is preceded by a name, such as "Cabin, 61.5, 8.3",
+        # add the position itself with that name instead. Return whether the
+        # text contained a valid position.
+        pieces = text.split(",")
+        if len(pieces) != 2 and len(pieces) != 3:
+            return False
+        
+        first = len(pieces) - 2
+        try:
+            latitude = Double.parseDouble(pieces[first].trim())
+            longitude = Double.parseDouble(pieces[first + 1].trim())
+        except NumberFormatException:
+            return False
+        
+        if Math.abs(latitude) > 90 or Math.abs(longitude) > 180:
+            return False
+        
+        if first == 0:
+            self.addNearestPlace(latitude, longitude)
+        else:
+            name = pieces[0].trim()
+            if name == "":
+                return False
+            self.addPosition(name, latitude, longitude)
+        
+        return True
+    
+    @args(void, [double, double])
+    def addNearestPlace(self, latitude, longitude):
+    
+        # Add the place nearest to the given position.
+        places = self.locator.nearest(latitude, longitude, 1)
+        if len(places) > 0:
+            self.addPlace(places[0])
+    
+    @args(void, [String, double, double])
+    def addPosition(self, name, latitude, longitude):
+    
+        # Add a place that will be fetched by its position instead of its
+        # path on the yr.no server.
+        name = name.replace("/", " ")
+        spec = "position/" + str(latitude) + "/" + str(longitude) + "/" + name
+        self.handler.addLocation(name, spec)
+    
+    @args(void, [int])
+    def addPlace(self, place):
+    
+        name = self.places.getName(place)
+        spec = self.places.getSpec(place)
+        
         # Remove the country from the name.
-        name = name[:name.indexOf(", ")]
+        name = name[:name.lastIndexOf(", ")]
         
         self.handler.addLocation(name, spec)
-        self.locationEdit.setText("")
+
+
+class PlaceLoader(AsyncTask):
+
+    # Opens the place table and indexes in a background thread and passes
+    # them to the add widget in the UI thread.
+    
+    #                 Params   Progress Result
+    __item_types__ = [Context, Object,  PlaceData]
+    
+    @args(void, [AddWidget])
+    def __init__(self, widget):
+    
+        AsyncTask.__init__(self)
+        self.widget = widget
+    
+    @args(Result, [[Params]])
+    def doInBackground(self, params):
+    
+        return PlaceData(params[0])
+    
+    @args(void, [Result])
+    def onPostExecute(self, result):
+    
+        self.widget.placesLoaded(result)
+
+
+class PlaceAdapter(BaseAdapter):
+
+    __interfaces__ = [Filterable]
+    
+    __fields__ = {"places": PlaceTable, "items": List(String),
+                  "filter": PlaceFilter}
+    
+    @args(void, [PlaceTable, PlaceIndex])
+    def __init__(self, places, index):
+    
+        BaseAdapter.__init__(self)
+        
+        self.places = places
+        self.items = []
+        self.filter = PlaceFilter(self, index)
+    
+    @args(void, [[int]])
+    def setPlaces(self, places):
+    
+        self.items.clear()
+        for place in places:
+            self.items.add(self.places.getName(place))
+        
+        if len(self.items) > 0:
+            self.notifyDataSetChanged()
+        else:
+            self.notifyDataSetInvalidated()
+    
+    def getCount(self):
+    
+        return len(self.items)
+    
+    def getItem(self, position):
+    
+        return self.items[position]
+    
+    def getItemId(self, position):
+    
+        return long(position)
+    
+    def getFilter(self):
+    
+        return self.filter
+    
+    def getView(self, position, convertView, parent):
+    
+        if convertView == None:
+            context = parent.getContext()
+            inflater = CAST(context.getSystemService(
+                Context.LAYOUT_INFLATER_SERVICE), LayoutInflater)
+            convertView = inflater.inflate(
+                android.R.layout.simple_dropdown_item_1line, parent, False)
+        
+        view = CAST(convertView, TextView)
+        view.setText(self.items[position])
+        return view
+
+
+class PlaceFilter(Filter):
+
+    # Searches for places in a background thread, passing the numbers of the
+    # places found to the adapter in the UI thread.
+    
+    __fields__ = {"adapter": PlaceAdapter, "index": PlaceIndex}
+    
+    @args(void, [PlaceAdapter, PlaceIndex])
+    def __init__(self, adapter, index):
+    
+        Filter.__init__(self)
+        
+        self.adapter = adapter
+        self.index = index
+    
+    @args(Filter.FilterResults, [CharSequence])
+    def performFiltering(self, constraint):
+    
+        results = Filter.FilterResults()
+        
+        if constraint == None:
+            places = array(int, 0)
+        else:
+            places = self.index.search(str(constraint), 20)
+        
+        results.values = places
+        results.count = len(places)
+        return results
+    
+    @args(void, [CharSequence, Filter.FilterResults])
+    def publishResults(self, constraint, results):
+    
+        if results.values != None:
+            self.adapter.setPlaces(CAST(results.values, [int]))
 
 
 class RemoveLocationListener:
@@ -348,7 +563,8 @@ class RemoveWidget(HBox):
 
 class ForecastWidget(RelativeLayout):
 
-    def __init__(self, context):
+    @args(void, [Context, SymbolCache])
+    def __init__(self, context, symbols):
     
         RelativeLayout.__init__(self, context)
         
@@ -356,6 +572,10 @@ class ForecastWidget(RelativeLayout):
         self.lightBackground = context.getResources().getColor(android.R.color.background_light)
         self.darkText = 0xff000000
         
+        # The name given to a place added by position, which is shown instead
+        # of the place named in the document.
+        self.placeName = ""
+        
         # Header
         header = LinearLayout(context)
         header.setOrientation(LinearLayout.VERTICAL)
@@ -373,9 +593,16 @@ class ForecastWidget(RelativeLayout):
         header.addView(self.placeLabel)
         header.addView(headerLine, headerLineParams)
         
-        # Middle - containing the forecast layout
-        self.scrollView = ScrollView(context)
-        self.scrollView.setId(2)
+        # Middle - containing the forecast list, which only creates views for
+        # the rows that are visible and reuses them as the list is scrolled.
+        self.adapter = ForecastAdapter(self.lightBackground, self.darkText,
+                                       symbols)
+        
+        self.listView = ListView(context)
+        self.listView.setId(2)
+        self.listView.setDivider(None)
+        self.listView.setDividerHeight(0)
+        self.listView.setAdapter(self.adapter)
         
         # Footer
         footer = LinearLayout(context)
@@ -392,11 +619,6 @@ class ForecastWidget(RelativeLayout):
         footer.addView(footerLine, footerLineParams)
         footer.addView(self.creditLabel)
         
-        # The forecast layout
-        self.forecastLayout = LinearLayout(context)
-        self.forecastLayout.setOrientation(LinearLayout.VERTICAL)
-        self.scrollView.addView(self.forecastLayout)
-        
         # Layout parameters
         headerParams = RelativeLayout.LayoutParams(
             ViewGroup.LayoutParams.MATCH_PARENT,
@@ -404,12 +626,12 @@ class ForecastWidget(RelativeLayout):
         headerParams.addRule(RelativeLayout.ALIGN_PARENT_TOP)
         headerParams.addRule(RelativeLayout.CENTER_HORIZONTAL)
         
-        scrollParams = RelativeLayout.LayoutParams(
+        listParams = RelativeLayout.LayoutParams(
             ViewGroup.LayoutParams.MATCH_PARENT,
             ViewGroup.LayoutParams.WRAP_CONTENT)
-        scrollParams.addRule(RelativeLayout.CENTER_HORIZONTAL)
-        scrollParams.addRule(RelativeLayout.BELOW, 1)
-        scrollParams.addRule(RelativeLayout.ABOVE, 3)
+        listParams.addRule(RelativeLayout.CENTER_HORIZONTAL)
+        listParams.addRule(RelativeLayout.BELOW, 1)
+        listParams.addRule(RelativeLayout.ABOVE, 3)
         
         footerParams = RelativeLayout.LayoutParams(
             ViewGroup.LayoutParams.MATCH_PARENT,
@@ -417,136 +639,362 @@ class ForecastWidget(RelativeLayout):
         footerParams.addRule(RelativeLayout.ALIGN_PARENT_BOTTOM)
         
         self.addView(header, headerParams)
-        self.addView(self.scrollView, scrollParams)
+        self.addView(self.listView, listParams)
         self.addView(footer, footerParams)
     
-    @args(void, [List(Forecast)])
-    def addForecasts(self, forecasts):
+    @args(void, [ForecastDocument])
+    def addForecasts(self, document):
     
-        self.forecastLayout.removeAllViews()
-        self.scrollView.scrollTo(0, 0)
-        
-        if len(forecasts) == 0:
-            return
+        self.clearForecasts(document)
         
-        self.placeLabel.setText(forecasts[0].place)
-        self.creditLabel.setText(forecasts[0].credit)
+        for forecast in document.forecasts:
+            self.adapter.addRows(forecast)
         
-        firstDate = forecasts[0].from_
-        calendar = Calendar.getInstance()
-        calendar.setTime(firstDate)
+        self.adapter.notifyDataSetChanged()
+    
+    @args(void, [String])
+    def setPlaceName(self, name):
+    
+        self.placeName = name
+    
+    @args(void, [ForecastDocument])
+    def clearForecasts(self, document):
+    
+        if self.placeName != "":
+            self.placeLabel.setText(self.placeName)
+        else:
+            self.placeLabel.setText(document.place)
+        self.creditLabel.setText(document.credit)
         
-        currentDay = calendar.get(Calendar.DAY_OF_MONTH)
+        self.adapter.clear()
+        self.listView.setSelection(0)
+    
+    @args(void, [[Forecast]])
+    def appendForecasts(self, forecasts):
+    
+        self.adapter.addForecasts(forecasts)
+
+
+class ForecastAdapter(BaseAdapter):
+
+    # Each forecast is shown using a row for the time and a row containing
+    # the symbol, temperature, description and wind, preceded by a row for
+    # the date if it is the first forecast or follows a day change:
+    #
+    #             Date
+    #             Time
+    # Temperature Symbol Description
+    #                    Wind
+    #
+    # The rows are described by ForecastRow objects with the following types:
+    #   0   date
+    #   1   time
+    #   2   forecast
+    
+    __fields__ = {"rows": List(ForecastRow)}
+    
+    @args(void, [int, int, SymbolCache])
+    def __init__(self, background, foreground, symbols):
+    
+        BaseAdapter.__init__(self)
         
-        context = self.getContext()
+        self.background = background
+        self.foreground = foreground
+        self.symbols = symbols
+        self.rows = []
         
+        self.formatter = ForecastFormatter()
+        self.currentDay = -1
+    
+    def clear(self):
+    
+        self.rows.clear()
+        self.currentDay = -1
+        self.formatter.update()
+        self.notifyDataSetChanged()
+    
+    @args(void, [[Forecast]])
+    def addForecasts(self, forecasts):
+    
+        # Add the rows for a batch of forecasts, only telling the list view
+        # about them once.
         for forecast in forecasts:
+            self.addRows(forecast)
         
-            #             Date
-            # Temperature Symbol Description
-            #                    Wind
-            
-            # Get the day of the month.
-            date = forecast.from_
-            calendar.setTime(date)
-            day = calendar.get(Calendar.DAY_OF_MONTH)
-            
-            # Add an item for the date for the first item and any item
-            # following a day change.
-            if date == firstDate or day != currentDay:
-                dateView = TextView(context)
-                dateView.setText(
-                    calendar.getDisplayName(Calendar.DAY_OF_WEEK,
-                        Calendar.LONG, Locale.getDefault()) + " " + \
-                    str(day) + " " + \
-                    calendar.getDisplayName(Calendar.MONTH,
-                        Calendar.LONG, Locale.getDefault()) + " " + \
-                    str(calendar.get(Calendar.YEAR)))
-                
-                dateView.setGravity(Gravity.CENTER)
-                dateView.setTypeface(Typeface.create(None, Typeface.BOLD))
-                dateView.setBackgroundColor(self.lightBackground)
-                dateView.setTextColor(0xff000000)
-                
-                self.forecastLayout.addView(dateView, self.rowLayout())
-            
-            currentDay = day
-            
-            # Time
-            timeString = String.format("%02d:%02d:%02d - ",
-                array([calendar.get(Calendar.HOUR_OF_DAY),
-                       calendar.get(Calendar.MINUTE),
-                       calendar.get(Calendar.SECOND)]))
-            
-            date = forecast.to_
-            calendar.setTime(date)
-            
-            timeString += String.format("%02d:%02d:%02d",
-                array([calendar.get(Calendar.HOUR_OF_DAY),
-                       calendar.get(Calendar.MINUTE),
-                       calendar.get(Calendar.SECOND)]))
-            
-            timeView = TextView(context)
-            timeView.setText(timeString)
-            
-            timeView.setGravity(Gravity.CENTER)
-            timeView.setTypeface(Typeface.create(None, Typeface.BOLD))
-            
-            self.forecastLayout.addView(timeView, self.rowLayout())
-            
-            # Symbol, temperature, description and wind
-            row = RelativeLayout(context)
-            
-            # Symbol
-            lp = self.itemLayout()
-            lp.addRule(RelativeLayout.CENTER_IN_PARENT)
-            
-            if forecast.symbol != -1:
-                imageView = ImageView(context)
-                imageView.setImageResource(forecast.symbol)
-                row.addView(imageView, lp)
+        self.notifyDataSetChanged()
+    
+    @args(void, [Forecast])
+    def addRows(self, forecast):
+    
+        time = forecast.from_
+        day = self.formatter.dayNumber(time)
+        
+        # The text for the date is only created once for each day.
+        if day != self.currentDay:
+            self.rows.add(ForecastRow(0, forecast, self.formatter.dateText(time)))
+        
+        self.currentDay = day
+        
+        self.rows.add(ForecastRow(1, forecast, None))
+        self.rows.add(ForecastRow(2, forecast, None))
+    
+    def getCount(self):
+    
+        return len(self.rows)
+    
+    def getItem(self, position):
+    
+        return self.rows[position].forecast
+    
+    def getItemId(self, position):
+    
+        return long(position)
+    
+    def getViewTypeCount(self):
+    
+        return 3
+    
+    def getItemViewType(self, position):
+    
+        return self.rows[position].rowType
+    
+    def areAllItemsEnabled(self):
+    
+        return False
+    
+    def isEnabled(self, position):
+    
+        return False
+    
+    def getView(self, position, convertView, parent):
+    
+        row = self.rows[position]
+        context = parent.getContext()
+        
+        # The list view only passes views of the same type as the row for
+        # reuse, so they can be updated instead of creating new ones.
+        if row.rowType == 2:
+            if convertView == None:
+                forecastView = ForecastView(context, self.symbols)
             else:
-                spacer = Space(context)
-                row.addView(spacer, lp)
+                forecastView = CAST(convertView, ForecastView)
             
-            # Temperature
-            tempView = TextView(context)
-            tempView.setTextSize(tempView.getTextSize() * 2)
-            
-            if forecast.temperatureUnit == "celsius":
-                tempView.setText(forecast.temperature + u"\u2103")
+            forecastView.setForecast(row.forecast)
+            return forecastView
+        
+        elif row.rowType == 1:
+            if convertView == None:
+                timeLabel = TimeLabel(context)
+                timeLabel.setGravity(Gravity.CENTER)
+                timeLabel.setTypeface(self.formatter.bold)
             else:
-                tempView.setText(forecast.temperature + " " + forecast.temperatureUnit)
-            
-            lp = self.itemLayout()
-            lp.addRule(RelativeLayout.CENTER_VERTICAL)
-            lp.addRule(RelativeLayout.ALIGN_PARENT_LEFT)
-            row.addView(tempView, lp)
-            
-            # Description and wind speed
-            descLayout = LinearLayout(context)
-            descLayout.setOrientation(LinearLayout.VERTICAL)
+                timeLabel = CAST(convertView, TimeLabel)
             
-            descView = TextView(context)
-            descView.setText(forecast.description)
-            descLayout.addView(descView, lp)
-            
-            windView = TextView(context)
-            windView.setText(forecast.windSpeed)
-            descLayout.addView(windView, lp)
-            
-            lp = self.itemLayout()
-            lp.addRule(RelativeLayout.CENTER_VERTICAL)
-            lp.addRule(RelativeLayout.ALIGN_PARENT_RIGHT)
-            row.addView(descLayout, lp)
-            
-            self.forecastLayout.addView(row, self.rowLayout())
+            self.formatter.formatTimes(timeLabel.buffer,
+                row.forecast.from_, row.forecast.to_)
+            timeLabel.setText(timeLabel.buffer, 0, len(timeLabel.buffer))
+            return timeLabel
+        
+        if convertView == None:
+            dateLabel = TextView(context)
+            dateLabel.setGravity(Gravity.CENTER)
+            dateLabel.setTypeface(self.formatter.bold)
+            dateLabel.setBackgroundColor(self.background)
+            dateLabel.setTextColor(self.foreground)
+        else:
+            dateLabel = CAST(convertView, TextView)
+        
+        dateLabel.setText(row.text)
+        return dateLabel
+
+
+class ForecastRow(Object):
+
+    __fields__ = {"rowType": int, "forecast": Forecast, "text": String}
+    
+    @args(void, [int, Forecast, String])
+    def __init__(self, rowType, forecast, text):
+    
+        Object.__init__(self)
+        
+        self.rowType = rowType
+        self.forecast = forecast
+        self.text = text
+
+
+class ForecastFormatter(Object):
+
+    # Formats the dates and times shown in the forecast list. The typeface
+    # and the names of days and months are only obtained when the locale
+    # changes, and times are written into existing character buffers, so
+    # that binding a row does not create any objects.
+    
+    __fields__ = {"dayNames": [String], "monthNames": [String],
+                  "digits": [char]}
+    
+    def __init__(self):
+    
+        Object.__init__(self)
+        
+        self.bold = Typeface.create(None, Typeface.BOLD)
+        self.digits = "0123456789".toCharArray()
+        self.locale = None
+        self.timeZone = None
+        
+        self.update()
+    
+    def update(self):
+    
+        locale = Locale.getDefault()
+        timeZone = TimeZone.getDefault()
+        
+        if locale.equals(self.locale) and timeZone.equals(self.timeZone):
+            return
+        
+        self.locale = locale
+        self.timeZone = timeZone
+        self.calendar = Calendar.getInstance(timeZone, locale)
+        
+        # The names of the days are indexed by the Calendar.DAY_OF_WEEK
+        # values and the names of the months by the Calendar.MONTH values.
+        symbols = DateFormatSymbols.getInstance(locale)
+        self.dayNames = symbols.getWeekdays()
+        self.monthNames = symbols.getMonths()
+    
+    @args(int, [long])
+    def dayNumber(self, time):
+    
+        # Return the number of days since the epoch in the local time zone.
+        return int((time + self.timeZone.getOffset(time)) / 86400000)
     
-    @args(LinearLayout.LayoutParams, [])
-    def rowLayout(self):
+    @args(String, [long])
+    def dateText(self, time):
+    
+        calendar = self.calendar
+        calendar.setTimeInMillis(time)
+        
+        return self.dayNames[calendar.get(Calendar.DAY_OF_WEEK)] + " " + \
+               str(calendar.get(Calendar.DAY_OF_MONTH)) + " " + \
+               self.monthNames[calendar.get(Calendar.MONTH)] + " " + \
+               str(calendar.get(Calendar.YEAR))
+    
+    @args(void, [[char], long, long])
+    def formatTimes(self, buffer, start, end):
+    
+        # The buffer contains "HH:MM:SS - HH:MM:SS" so only the digits need
+        # to be written.
+        self.formatTime(buffer, 0, start)
+        self.formatTime(buffer, 11, end)
+    
+    @args(void, [[char], int, long])
+    def formatTime(self, buffer, i, time):
+    
+        seconds = int(((time + self.timeZone.getOffset(time)) / 1000) % 86400)
+        
+        self.formatNumber(buffer, i, seconds / 3600)
+        self.formatNumber(buffer, i + 3, (seconds / 60) % 60)
+        self.formatNumber(buffer, i + 6, seconds % 60)
+    
+    @args(void, [[char], int, int])
+    def formatNumber(self, buffer, i, value):
+    
+        buffer[i] = self.digits[value / 10]
+        buffer[i + 1] = self.digits[value % 10]
+
+
+class TimeLabel(TextView):
+
+    __fields__ = {"buffer": [char]}
+    
+    @args(void, [Context])
+    def __init__(self, context):
     
-        return LinearLayout.LayoutParams(ViewGroup.LayoutParams.MATCH_PARENT,
-                                         ViewGroup.LayoutParams.WRAP_CONTENT)
+        TextView.__init__(self, context)
+        
+        # Each label needs its own buffer because the text view refers to
+        # the characters in it instead of copying them.
+        self.buffer = "00:00:00 - 00:00:00".toCharArray()
+
+
+class ForecastView(RelativeLayout):
+
+    # Symbol, temperature, description and wind
+    
+    @args(void, [Context, SymbolCache])
+    def __init__(self, context, symbols):
+    
+        RelativeLayout.__init__(self, context)
+        
+        self.symbols = symbols
+        
+        # Symbol
+        self.imageView = ImageView(context)
+        
+        lp = self.itemLayout()
+        lp.addRule(RelativeLayout.CENTER_IN_PARENT)
+        self.addView(self.imageView, lp)
+        
+        # Temperature
+        self.tempView = TextView(context)
+        self.tempView.setTextSize(self.tempView.getTextSize() * 2)
+        
+        lp = self.itemLayout()
+        lp.addRule(RelativeLayout.CENTER_VERTICAL)
+        lp.addRule(RelativeLayout.ALIGN_PARENT_LEFT)
+        self.addView(self.tempView, lp)
+        
+        # Description and wind speed
+        descLayout = LinearLayout(context)
+        descLayout.setOrientation(LinearLayout.VERTICAL)
+        
+        self.descView = TextView(context)
+        descLayout.addView(self.descView)
+        
+        self.windView = TextView(context)
+        descLayout.addView(self.windView)
+        
+        lp = self.itemLayout()
+        lp.addRule(RelativeLayout.CENTER_VERTICAL)
+        lp.addRule(RelativeLayout.ALIGN_PARENT_RIGHT)
+        self.addView(descLayout, lp)
+    
+    @args(void, [Forecast])
+    def setForecast(self, forecast):
+    
+        # Hide the symbol instead of removing it so that the layout of the
+        # row is the same whether or not there is a symbol. The images are
+        # usually decoded before the forecasts are shown.
+        if forecast.symbol != -1:
+            bitmap = self.symbols.getSymbol(forecast.symbol)
+            self.imageView.setImageBitmap(bitmap)
+            self.imageView.setVisibility(View.VISIBLE)
+        else:
+            self.imageView.setImageDrawable(None)
+            self.imageView.setVisibility(View.INVISIBLE)
+        
+        temperature = self.formatValue(forecast.temperature)
+        
+        if forecast.temperatureUnit == "celsius":
+            self.tempView.setText(temperature + u"\u2103")
+        else:
+            self.tempView.setText(temperature + " " + forecast.temperatureUnit)
+        
+        self.descView.setText(forecast.description)
+        self.windView.setText(forecast.windName)
+    
+    @args(String, [float])
+    def formatValue(self, value):
+    
+        if Float.isNaN(value):
+            return ""
+        
+        # Show whole numbers without a decimal point, as they appear in the
+        # forecast documents.
+        rounded = Math.round(value)
+        if rounded == value:
+            return str(rounded)
+        else:
+            return Float.toString(value)
     
     @args(RelativeLayout.LayoutParams, [])
     def itemLayout(self):
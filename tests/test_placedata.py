@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_placedata.py - Tests for the place data used by the Weather Forecast
+                    build script.
+
+Copyright (C) 2017 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os, sys, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import placedata
+
+def place(spec, municipality, county, searchable = False, priority = 50,
+          place_type = u"Farm"):
+
+    name = spec.split(u"/")[-1].split(u"~")[0]
+    return placedata.Place(name + u", Norway", spec, name,
+                           [municipality, county, u"Norway"], 60.0, 10.0,
+                           searchable, priority, place_type)
+
+
+def names(catalogue):
+
+    return dict((place.spec, place.display_name) for place in catalogue)
+
+
+class MakeCatalogueTest(unittest.TestCase):
+
+    def test_unique_names_unchanged(self):
+
+        catalogue = placedata.make_catalogue([
+            place(u"Norway/Oppland/Lillehammer/Lillehammer", u"Lillehammer",
+                  u"Oppland", True, 11),
+            place(u"Norway/Nordland/Fauske/Fauske", u"Fauske", u"Nordland")])
+
+        self.assertEqual(names(catalogue), {
+            u"Norway/Oppland/Lillehammer/Lillehammer": u"Lillehammer, Norway",
+            u"Norway/Nordland/Fauske/Fauske": u"Fauske, Norway"})
+
+    def test_searchable_place_keeps_name(self):
+
+        # The town can be searched for, so it keeps its name even though
+        # other places are more important.
+        catalogue = placedata.make_catalogue([
+            place(u"Norway/Akershus/Skedsmo/Lillestrøm", u"Skedsmo",
+                  u"Akershus", True, 21, u"Town"),
+            place(u"Norway/Akershus/Skedsmo/Lillestrøm~1", u"Skedsmo",
+                  u"Akershus", False, 11, u"Church"),
+            place(u"Norway/Hedmark/Eidskog/Lillestrøm", u"Eidskog",
+                  u"Hedmark")])
+
+        self.assertEqual(names(catalogue), {
+            u"Norway/Akershus/Skedsmo/Lillestrøm": u"Lillestrøm, Norway",
+            u"Norway/Akershus/Skedsmo/Lillestrøm~1":
+                u"Lillestrøm (Skedsmo), Norway",
+            u"Norway/Hedmark/Eidskog/Lillestrøm":
+                u"Lillestrøm (Eidskog), Norway"})
+
+    def test_most_important_place_keeps_name(self):
+
+        catalogue = placedata.make_catalogue([
+            place(u"Norway/Nordland/Fauske/Fauske", u"Fauske", u"Nordland",
+                  priority = 30),
+            place(u"Norway/Nordland/Bodø/Fauske", u"Bodø", u"Nordland")])
+
+        self.assertEqual(names(catalogue), {
+            u"Norway/Nordland/Fauske/Fauske": u"Fauske, Norway",
+            u"Norway/Nordland/Bodø/Fauske": u"Fauske (Bodø), Norway"})
+
+    def test_qualifiers_only_added_when_needed(self):
+
+        # No place is more important than the others, so they are all
+        # qualified, but only the ones in the same municipality and county
+        # include their place types.
+        catalogue = placedata.make_catalogue([
+            place(u"Norway/Troms/Bardu/Berg", u"Bardu", u"Troms"),
+            place(u"Norway/Troms/Senja/Berg", u"Senja", u"Troms",
+                  place_type = u"Farm"),
+            place(u"Norway/Troms/Senja/Berg~1", u"Senja", u"Troms",
+                  place_type = u"Church")])
+
+        self.assertEqual(names(catalogue), {
+            u"Norway/Troms/Bardu/Berg": u"Berg (Bardu), Norway",
+            u"Norway/Troms/Senja/Berg": u"Berg (Senja, Troms, Farm), Norway",
+            u"Norway/Troms/Senja/Berg~1":
+                u"Berg (Senja, Troms, Church), Norway"})
+
+    def test_indistinguishable_places_numbered(self):
+
+        catalogue = placedata.make_catalogue([
+            place(u"Norway/Troms/Senja/Berg~2", u"Senja", u"Troms"),
+            place(u"Norway/Troms/Senja/Berg~1", u"Senja", u"Troms")])
+
+        self.assertEqual(names(catalogue), {
+            u"Norway/Troms/Senja/Berg~1": u"Berg (Senja, Troms, Farm, 1), Norway",
+            u"Norway/Troms/Senja/Berg~2": u"Berg (Senja, Troms, Farm, 2), Norway"})
+
+    def test_no_place_dropped(self):
+
+        places = [place(u"Norway/Troms/Senja/Berg~%i" % i, u"Senja", u"Troms",
+                        i == 0, i) for i in range(5)]
+        catalogue = placedata.make_catalogue(places)
+
+        self.assertEqual(len(catalogue), 5)
+        self.assertEqual(len(set(names(catalogue).values())), 5)
+        self.assertEqual(names(catalogue)[u"Norway/Troms/Senja/Berg~0"],
+                         u"Berg, Norway")
+
+
+if __name__ == "__main__":
+    unittest.main()